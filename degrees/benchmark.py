@@ -0,0 +1,275 @@
+"""
+Benchmarks for the degrees search engine.
+
+Usage: python benchmark.py search [directory] [--queries N]
+       python benchmark.py frontier [--sizes N ...] [--ops N]
+       python benchmark.py index [directory] [--queries N]
+       python benchmark.py store [directory]
+       python benchmark.py snapshot [directory]
+       python benchmark.py names [directory] [--queries N]
+       python benchmark.py load [directory]
+"""
+
+import argparse
+import importlib
+import os
+import random
+import time
+import tracemalloc
+
+import degrees
+import store
+from util import (Node, StackFrontier, QueueFrontier,
+                  DequeStackFrontier, DequeQueueFrontier)
+
+
+def count_expansions():
+    """
+    Wraps `degrees.neighbors_for_person` so that every expanded node is
+    counted. Returns a function that reads and resets the counter.
+    """
+    neighbors_for_person = degrees.neighbors_for_person
+    counter = [0]
+
+    def counting(person_id):
+        counter[0] += 1
+        return neighbors_for_person(person_id)
+
+    def read():
+        count, counter[0] = counter[0], 0
+        return count
+
+    degrees.neighbors_for_person = counting
+    return read
+
+
+def benchmark_search(args):
+    """
+    Compares nodes expanded and wall time of one-sided and bidirectional
+    search over the same random pairs of people.
+    """
+    degrees.load_data(args.directory)
+    rng = random.Random(args.seed)
+    people = sorted(degrees.people)
+    pairs = [(rng.choice(people), rng.choice(people))
+             for _ in range(args.queries)]
+    expansions = count_expansions()
+
+    print(f"{len(pairs)} queries over {len(people)} people")
+    for label, bidirectional in (("one-sided", False), ("bidirectional", True)):
+        expanded = 0
+        start = time.perf_counter()
+        for source, target in pairs:
+            degrees.shortest_path(source, target, bidirectional=bidirectional)
+            expanded += expansions()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:>14}: {expanded:>10} nodes expanded, "
+              f"{elapsed:.3f}s ({elapsed / len(pairs) * 1000:.2f} ms/query)")
+
+
+def benchmark_frontier(args):
+    """
+    Times contains_state and remove on list-backed and deque-backed
+    frontiers holding a large number of nodes.
+    """
+    frontiers = (StackFrontier, QueueFrontier,
+                 DequeStackFrontier, DequeQueueFrontier)
+    for size in args.sizes:
+        print(f"{size} nodes in frontier, {args.ops} operations each")
+        for frontier_class in frontiers:
+            frontier = frontier_class()
+            for state in range(size):
+                frontier.add(Node(state=state, parent=None, action=None))
+
+            # Probe the middle of the frontier, as a search does on average
+            start = time.perf_counter()
+            for state in range(size // 2, size // 2 + args.ops):
+                frontier.contains_state(state)
+            contains = (time.perf_counter() - start) / args.ops
+
+            start = time.perf_counter()
+            for _ in range(args.ops):
+                frontier.remove()
+            remove = (time.perf_counter() - start) / args.ops
+
+            print(f"  {frontier_class.__name__:>18}: "
+                  f"contains_state {contains * 1e6:>10.2f} us, "
+                  f"remove {remove * 1e6:>10.2f} us")
+
+
+def benchmark_index(args):
+    """
+    Reports co-star index build time and memory next to the memory of
+    the dict-of-sets representation, then compares query times.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(args.directory)
+    load_time = time.perf_counter() - start
+    load_memory = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    degrees.build_index()
+    build_time = time.perf_counter() - start
+    index_memory = tracemalloc.get_traced_memory()[0] - load_memory
+    tracemalloc.stop()
+
+    print(f"dict-of-sets: {load_memory / 2 ** 20:>8.1f} MiB, "
+          f"loaded in {load_time:.2f}s")
+    print(f"co-star index: {index_memory / 2 ** 20:>7.1f} MiB "
+          f"({degrees.index.nbytes() / 2 ** 20:.1f} MiB of arrays, "
+          f"{len(degrees.index.costars)} pairs), built in {build_time:.2f}s")
+
+    rng = random.Random(args.seed)
+    people = sorted(degrees.people)
+    pairs = [(rng.choice(people), rng.choice(people))
+             for _ in range(args.queries)]
+    built = degrees.index
+    for label, index in (("dict-of-sets", None), ("co-star index", built)):
+        degrees.index = index
+        for bidirectional in (False, True):
+            start = time.perf_counter()
+            for source, target in pairs:
+                degrees.shortest_path(source, target,
+                                      bidirectional=bidirectional)
+            elapsed = time.perf_counter() - start
+            mode = "bidirectional" if bidirectional else "one-sided"
+            print(f"  {label:>14}, {mode:>13}: "
+                  f"{elapsed / len(pairs) * 1000:.2f} ms/query")
+
+
+def benchmark_store(args):
+    """
+    Compares memory and load time of the dict-of-sets data and the
+    compact GraphStore.
+    """
+    for label, compact in (("dict-of-sets", False), ("compact store", True)):
+        importlib.reload(degrees)
+        tracemalloc.start()
+        start = time.perf_counter()
+        degrees.load_data(args.directory, compact=compact)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>14}: {current / 2 ** 20:>8.1f} MiB held, "
+              f"{peak / 2 ** 20:>8.1f} MiB peak, loaded in {elapsed:.2f}s")
+    print(f"{'':>14}  {degrees.store.nbytes() / 2 ** 20:>8.1f} MiB of "
+          f"store tables")
+
+
+def benchmark_snapshot(args):
+    """
+    Compares startup time of parsing the CSV files with mapping a
+    snapshot of them back in.
+    """
+    runs = (("csv", {}), ("csv, compact", {"compact": True}),
+            ("snapshot, first run", {"snapshot": True}),
+            ("snapshot, cached", {"snapshot": True}))
+    snapshot = os.path.join(args.directory, store.SNAPSHOT_NAME)
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    for label, options in runs:
+        importlib.reload(degrees)
+        start = time.perf_counter()
+        degrees.load_data(args.directory, **options)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>20}: {elapsed * 1000:>10.2f} ms")
+
+
+def benchmark_names(args):
+    """
+    Reports name index build time and memory, and the latency of prefix
+    and fuzzy lookups of misspelled names.
+    """
+    degrees.load_data(args.directory)
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.build_name_index()
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    index = degrees.name_index
+    print(f"name index: {len(index.names)} names, "
+          f"{len(index.postings)} trigrams, built in {build_time:.2f}s")
+    print(f"  {memory / 2 ** 20:.1f} MiB traced "
+          f"({index.nbytes() / 2 ** 20:.1f} MiB of tables and postings)")
+
+    # Misspell names by dropping one character
+    rng = random.Random(args.seed)
+    names = sorted(degrees.names)
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names)
+        i = rng.randrange(len(name))
+        queries.append(name[:i] + name[i + 1:])
+
+    for label, lookup in (("prefix", index.prefix), ("fuzzy", index.fuzzy)):
+        start = time.perf_counter()
+        for query in queries:
+            lookup(query)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:>6}: {elapsed / len(queries) * 1000:.3f} ms/query")
+
+
+def benchmark_load(args):
+    """
+    Compares the CSV loader of degrees.py with the chunked one.
+    """
+    for label, chunked in (("rows", False), ("chunked", True)):
+        importlib.reload(degrees)
+        start = time.perf_counter()
+        timings = degrees.load_data(args.directory, chunked=chunked)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>8}: {elapsed:.2f}s")
+        for filename, seconds in (timings or {}).items():
+            print(f"{'':>10}{filename}: {seconds:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="one-sided vs bidirectional")
+    search.add_argument("directory", nargs="?", default="large")
+    search.add_argument("--queries", type=int, default=100)
+    search.add_argument("--seed", type=int, default=0)
+    search.set_defaults(run=benchmark_search)
+
+    frontier = commands.add_parser("frontier", help="frontier operations")
+    frontier.add_argument("--sizes", type=int, nargs="+",
+                          default=[10 ** 5, 10 ** 6])
+    frontier.add_argument("--ops", type=int, default=100)
+    frontier.set_defaults(run=benchmark_frontier)
+
+    index = commands.add_parser("index", help="co-star index cost")
+    index.add_argument("directory", nargs="?", default="large")
+    index.add_argument("--queries", type=int, default=100)
+    index.add_argument("--seed", type=int, default=0)
+    index.set_defaults(run=benchmark_index)
+
+    compact = commands.add_parser("store", help="compact store memory")
+    compact.add_argument("directory", nargs="?", default="large")
+    compact.set_defaults(run=benchmark_store)
+
+    snapshot = commands.add_parser("snapshot", help="startup from snapshot")
+    snapshot.add_argument("directory", nargs="?", default="large")
+    snapshot.set_defaults(run=benchmark_snapshot)
+
+    names = commands.add_parser("names", help="name index cost")
+    names.add_argument("directory", nargs="?", default="large")
+    names.add_argument("--queries", type=int, default=1000)
+    names.add_argument("--seed", type=int, default=0)
+    names.set_defaults(run=benchmark_names)
+
+    load = commands.add_parser("load", help="row vs chunked loading")
+    load.add_argument("directory", nargs="?", default="large")
+    load.set_defaults(run=benchmark_load)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+import argparse
 import csv
+import json
+import random
 import sys
+from functools import partial
 
-from util import Node, StackFrontier, QueueFrontier
+import ingest
+import paths
+import service
+import stats
+from index import CostarIndex
+from nameindex import NameIndex
+from store import GraphStore
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +23,43 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Optional CostarIndex over `people` and `movies`, used by searches when built
+index = None
 
-def load_data(directory):
+# Optional NameIndex over the keys of `names`, used to suggest names
+name_index = None
+
+# GraphStore backing `names`, `people` and `movies` when loaded compactly
+store = None
+
+
+def load_data(directory, compact=False, snapshot=False, chunked=False):
     """
     Load data from CSV files into memory.
+
+    If `chunked` is set, the files are read in chunks of tuple rows by
+    the `ingest` module, and a dictionary of the seconds spent on each
+    file is returned.
+
+    If `compact` is set, the data is held in a GraphStore of interned
+    arrays, and `names`, `people` and `movies` become read-only views of it.
+
+    If `snapshot` is set, the GraphStore is memory-mapped from a snapshot
+    file in the directory, which is written on first use and rebuilt
+    whenever the CSV files change.
     """
+    if compact or snapshot:
+        global store, names, people, movies
+        if snapshot:
+            store = GraphStore.load_cached(directory)
+        else:
+            store = GraphStore.load(directory)
+        names, people, movies = store.names, store.people, store.movies
+        return
+
+    if chunked:
+        return ingest.load(directory, names, people, movies)
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,24 +95,98 @@ def load_data(directory):
                 pass
 
 
+def build_index():
+    """
+    Builds the co-star adjacency index over the loaded data, so that
+    later searches read each person's neighbors from compact arrays.
+    """
+    global index
+    if store is not None:
+        index = CostarIndex.from_store(store)
+    else:
+        index = CostarIndex(people, movies)
+
+
+def build_name_index():
+    """
+    Builds the prefix and trigram index over the loaded names, used to
+    suggest names for queries that match no one.
+    """
+    global name_index
+    name_index = NameIndex(names)
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage=("python degrees.py [--bidirectional] [--index] [--compact] "
+               "[--snapshot] [--chunked] [--batch FILE | --serve ADDRESS | "
+               "--histogram SAMPLES] [--workers N] [directory]")
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both source and target at once")
+    parser.add_argument("--index", action="store_true",
+                        help="build the co-star adjacency index after loading")
+    parser.add_argument("--compact", action="store_true",
+                        help="hold the data in a compact interned store")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="map the compact store from a cached snapshot")
+    parser.add_argument("--chunked", action="store_true",
+                        help="read the CSV files in chunks of tuple rows "
+                             "and report per-file timing")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--batch", metavar="FILE",
+                      help="answer 'source,target' lines from FILE ('-' for "
+                           "stdin) as JSON lines")
+    mode.add_argument("--serve", metavar="ADDRESS",
+                      help="answer queries over HTTP at HOST:PORT, or over "
+                           "a Unix socket at unix:PATH")
+    mode.add_argument("--histogram", metavar="SAMPLES", type=int,
+                      help="print the degree histogram of SAMPLES random "
+                           "people as JSON")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --batch, --serve and "
+                           "--histogram")
+    args = parser.parse_args()
+    directory = args.directory
+
+    # Keep stdout for results when answering many queries
+    streaming = args.batch or args.serve or args.histogram
+    log = sys.stderr if streaming else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    timings = load_data(directory, compact=args.compact,
+                        snapshot=args.snapshot, chunked=args.chunked)
+    for filename, seconds in (timings or {}).items():
+        print(f"  {filename}: {seconds:.2f}s", file=log)
+    if args.index:
+        build_index()
+    print("Data loaded.", file=log)
 
-    source = person_id_for_name(input("Name: "))
+    answer = partial(answer_query, bidirectional=args.bidirectional)
+    if args.batch:
+        if args.batch == "-":
+            service.run_batch(answer, sys.stdin, sys.stdout, args.workers)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                service.run_batch(answer, f, sys.stdout, args.workers)
+        return
+    if args.serve:
+        service.serve(answer, args.serve, args.workers)
+        return
+    if args.histogram:
+        print(json.dumps(degree_histogram(args.histogram, args.workers)))
+        return
+
+    source = prompt_person()
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = prompt_person()
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=args.bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -84,16 +201,131 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is set, the search expands from both ends
+    and meets in the middle instead of growing one frontier from
+    the source.
+
+    Searches run over interned ids of the co-star index when it has been
+    built, or of the compact store when the data was loaded into one.
+
+    If no possible path, returns None.
+    """
+    search = bidirectional_path if bidirectional else breadth_first_path
+    graph = index if index is not None else store
+    if graph is None:
+        return search(source, target, neighbors_for_person)
+
+    path = search(graph.person_index[source], graph.person_index[target],
+                  graph.neighbors)
+    return graph.decode_path(path)
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, lazily, without holding more
+    than one path in memory.
+
+    Yields nothing if the people are not connected.
+    """
+    return _search_paths(paths.all_shortest_paths, source, target)
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields up to `k` shortest lists of (movie_id, person_id) pairs that
+    connect the source to the target without repeating a person, in
+    order of length.
+    """
+    return _search_paths(paths.k_shortest_paths, source, target, k)
+
+
+def _search_paths(search, source, target, *args):
+    """
+    Runs a path-enumerating search from the `paths` module over the
+    co-star index, the compact store or the dictionaries, whichever
+    `shortest_path` would use, and yields (movie_id, person_id) paths.
+    """
+    graph = index if index is not None else store
+    if graph is None:
+        yield from search(source, target, neighbors_for_person, *args)
+        return
+
+    found = search(graph.person_index[source], graph.person_index[target],
+                   graph.neighbors, *args)
+    for path in found:
+        yield graph.decode_path(path)
+
+
+def distances_from(source, max_depth=None):
+    """
+    Returns a dictionary mapping the person_id of everyone connected to
+    the source, within `max_depth` degrees if given, to their degrees
+    of separation from the source, found by one breadth-first search.
+    """
+    graph = index if index is not None else store
+    if graph is None:
+        layers = stats.distance_layers(source, neighbors_for_person, max_depth)
+        return {person_id: distance
+                for distance, layer in enumerate(layers)
+                for person_id in layer}
+
+    layers = stats.distance_layers(graph.person_index[source],
+                                   graph.neighbors, max_depth)
+    return {graph.person_ids[person]: distance
+            for distance, layer in enumerate(layers)
+            for person in layer}
+
+
+def degree_histogram(samples, workers=None, seed=None):
+    """
+    Samples `samples` random people and runs one breadth-first search
+    from each in a pool of worker processes.
+
+    Returns a dictionary with "histogram", the number of (sampled person,
+    other person) pairs at each degree of separation, "unreachable", the
+    number of pairs not connected, and "eccentricities", the number of
+    sampled people whose farthest connection is at each degree.
+    """
+    graph = index if index is not None else store
+    if graph is None:
+        population = list(people)
+    else:
+        population = range(len(graph.person_ids))
+    sources = random.Random(seed).sample(population,
+                                         min(samples, len(population)))
+    return stats.sample_histogram(_distance_counts, sources, len(population),
+                                  workers)
+
+
+def _distance_counts(source):
+    """
+    Returns the number of people at each degree of separation from the
+    source, which is interned if the index or store is in use.
+    """
+    graph = index if index is not None else store
+    if graph is None:
+        return stats.distance_counts(source, neighbors_for_person)
+    return stats.distance_counts(source, graph.neighbors)
+
+
+def breadth_first_path(source, target, neighbors_for):
+    """
+    Returns the shortest list of (action, state) pairs that connect the
+    source to the target, found by breadth-first search from the source.
+    `neighbors_for(state)` returns the (action, state) pairs reachable
+    from a state.
+
     If no possible path, returns None.
     """
     result = list()
     explored = set()
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     node = Node(state=source, parent=None, action=None)
     frontier.add(node)
 
@@ -107,20 +339,108 @@ def shortest_path(source, target):
 
         explored.add(node.state)
 
-        neighbors = neighbors_for_person(node.state)
+        neighbors = neighbors_for(node.state)
 
         for movie, person in neighbors:
             if not frontier.contains_state(person) and person not in explored:
                 frontier.add(Node(state=person, parent=node, action=movie))
 
-    while True:
+    while node.parent is not None:
         result.append((node.action, node.state))
+        node = node.parent
 
-        if node.parent.state == source:
-            result.reverse()
-            return result
+    result.reverse()
+    return result
 
-        node = node.parent
+
+def bidirectional_path(source, target, neighbors_for):
+    """
+    Returns the shortest list of (action, state) pairs that connect the
+    source to the target, found by breadth-first search from both ends
+    at once. `neighbors_for(state)` returns the (action, state) pairs
+    reachable from a state, and must be symmetric.
+
+    Each step expands one whole layer of the smaller frontier, so the
+    two searches together explore roughly the square root of the nodes
+    a one-sided search needs.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to the (movie_id, person_id) step that reached it,
+    # towards the source for `forward` and towards the target for `backward`
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+        expand_forward = len(forward_layer) <= len(backward_layer)
+        if expand_forward:
+            layer, parents, other = forward_layer, forward, backward
+        else:
+            layer, parents, other = backward_layer, backward, forward
+
+        next_layer = []
+        meeting = None
+        for person in layer:
+            for movie, neighbor in neighbors_for(person):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                next_layer.append(neighbor)
+                # Every meeting found in this layer has the same length on
+                # this side, so the first one may still be longer overall
+                # than a later one; keep the shortest
+                if neighbor in other:
+                    length = _steps(other, neighbor)
+                    if meeting is None or length < meeting[0]:
+                        meeting = (length, neighbor)
+
+        if meeting is not None:
+            return _join_paths(forward, backward, meeting[1])
+
+        if expand_forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def _steps(parents, person):
+    """
+    Returns the number of steps from `person` back to the root of
+    the search tree described by `parents`.
+    """
+    steps = 0
+    while parents[person] is not None:
+        person = parents[person][1]
+        steps += 1
+    return steps
+
+
+def _join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path from the forward root to the
+    backward root that passes through `meeting`.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, parent = forward[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, child = backward[person]
+        path.append((movie, child))
+        person = child
+    return path
 
 
 def person_id_for_name(name):
@@ -149,6 +469,91 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def prompt_person():
+    """
+    Prompts for a name until it matches someone, suggesting similar
+    names after each miss. Returns the IMDB id, or None if a name
+    matches no one and nothing similar either.
+    """
+    while True:
+        name = input("Name: ")
+        if name.lower() in names:
+            return person_id_for_name(name)
+        suggestions = suggest_names(name)
+        if not suggestions:
+            return None
+        print(f"Person not found. Did you mean: {', '.join(suggestions)}?")
+
+
+def suggest_names(name, limit=5):
+    """
+    Returns up to `limit` names of people similar to `name`, names it
+    is a prefix of first. Builds the name index on the first call.
+    """
+    if name_index is None:
+        build_name_index()
+    suggestions = []
+    for match in name_index.suggestions(name, limit):
+        person_id = min(names[match])
+        suggestions.append(people[person_id]["name"])
+    return suggestions
+
+
+def resolve_person(name):
+    """
+    Returns the IMDB id for a person's name, or for a person id,
+    without prompting.
+
+    Raises LookupError if no one, or more than one person, matches.
+    """
+    person_ids = names.get(name.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    elif len(person_ids) > 1:
+        raise LookupError(
+            f"Ambiguous name '{name}', use one of: "
+            + ", ".join(sorted(person_ids))
+        )
+    elif name in people:
+        return name
+    raise LookupError(f"Person '{name}' not found.")
+
+
+def answer_query(query, bidirectional=False):
+    """
+    Answers a (source name, target name) query with a JSON-ready dict
+    of the degrees of separation and the path between them.
+
+    "degrees" and "path" are None when the people are not connected,
+    and an "error" is returned instead when a name does not resolve.
+    """
+    source_name, target_name = query
+    response = {"source": source_name, "target": target_name}
+    try:
+        source = resolve_person(source_name)
+        target = resolve_person(target_name)
+    except LookupError as e:
+        response["error"] = str(e)
+        return response
+
+    path = shortest_path(source, target, bidirectional=bidirectional)
+    if path is None:
+        response["degrees"] = None
+        response["path"] = None
+    else:
+        response["degrees"] = len(path)
+        response["path"] = [
+            {
+                "movie_id": movie_id,
+                "movie": movies[movie_id]["title"],
+                "person_id": person_id,
+                "person": people[person_id]["name"]
+            }
+            for movie_id, person_id in path
+        ]
+    return response
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
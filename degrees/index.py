@@ -0,0 +1,89 @@
+from array import array
+
+
+class CostarIndex():
+    """
+    Co-star adjacency index over the `people` and `movies` dictionaries.
+
+    People and movies are interned to dense integers. For person `i`, the
+    pairs (movie, co-star) who starred with them are stored in
+    `movies[offsets[i]:offsets[i + 1]]` and
+    `costars[offsets[i]:offsets[i + 1]]`, so an expansion is two slices.
+    """
+
+    def __init__(self, people, movies):
+        self.person_ids = list(people)
+        self.person_index = {
+            person_id: i for i, person_id in enumerate(self.person_ids)
+        }
+        self.movie_ids = list(movies)
+        movie_index = {
+            movie_id: i for i, movie_id in enumerate(self.movie_ids)
+        }
+
+        # Stars of each movie as integers, converted once instead of once
+        # per person who starred in the movie
+        stars = [
+            array("i", sorted(self.person_index[person_id]
+                              for person_id in movies[movie_id]["stars"]))
+            for movie_id in self.movie_ids
+        ]
+
+        self.offsets = array("q", [0])
+        self.movies = array("i")
+        self.costars = array("i")
+        for i, person_id in enumerate(self.person_ids):
+            for movie in sorted(movie_index[movie_id]
+                                for movie_id in people[person_id]["movies"]):
+                for costar in stars[movie]:
+                    if costar != i:
+                        self.movies.append(movie)
+                        self.costars.append(costar)
+            self.offsets.append(len(self.costars))
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Builds the index from the interned arrays of a GraphStore,
+        sharing its id tables.
+        """
+        self = cls.__new__(cls)
+        self.person_ids = store.person_ids
+        self.person_index = store.person_index
+        self.movie_ids = store.movie_ids
+        self.offsets = array("q", [0])
+        self.movies = array("i")
+        self.costars = array("i")
+        for i in range(len(store.person_ids)):
+            for movie in store.movies_of(i):
+                for costar in store.stars_of(movie):
+                    if costar != i:
+                        self.movies.append(movie)
+                        self.costars.append(costar)
+            self.offsets.append(len(self.costars))
+        return self
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) pairs of interned ids for people
+        who starred with a given interned person.
+        """
+        start, end = self.offsets[person], self.offsets[person + 1]
+        return zip(self.movies[start:end], self.costars[start:end])
+
+    def decode_path(self, path):
+        """
+        Converts a path of interned (movie, person) pairs back to
+        (movie_id, person_id) pairs. Returns None for a missing path.
+        """
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the adjacency arrays.
+        """
+        return sum(a.itemsize * len(a)
+                   for a in (self.offsets, self.movies, self.costars))
@@ -0,0 +1,120 @@
+"""
+Faster loading of the degrees CSV files into the `names`, `people` and
+`movies` dictionaries.
+
+The files are read one after another: CSV parsing holds the GIL, so
+threads would not parse two files at once. The speedup over the loader
+in degrees.py comes from two changes alone. Rows are read in chunks with
+`csv.reader` rather than `csv.DictReader`, so no per-row dictionary is
+built, and the cyclic garbage collector is paused while the millions of
+new containers are created, since none of them can form a cycle.
+"""
+
+import csv
+import gc
+import time
+from itertools import islice
+from operator import itemgetter
+
+# Rows of a CSV file read per chunk
+CHUNK_SIZE = 65536
+
+
+def load(directory, names, people, movies):
+    """
+    Loads the CSV files in a directory into the given dictionaries, with
+    the same contents as the serial loader in degrees.py.
+
+    Returns a dictionary mapping each file name to the seconds spent
+    reading it and building its part of the dictionaries.
+    """
+    timings = {}
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        timings["people.csv"] = _timed(
+            load_people, f"{directory}/people.csv", names, people
+        )
+        timings["movies.csv"] = _timed(
+            load_movies, f"{directory}/movies.csv", movies
+        )
+        timings["stars.csv"] = _timed(
+            load_stars, f"{directory}/stars.csv", people, movies
+        )
+    finally:
+        if collecting:
+            gc.enable()
+    return timings
+
+
+def load_people(filename, names, people):
+    """
+    Adds the rows of people.csv to the `names` and `people` dictionaries.
+    """
+    for chunk in read_chunks(filename, ("id", "name", "birth")):
+        for person_id, name, birth in chunk:
+            people[person_id] = {"name": name, "birth": birth, "movies": set()}
+            key = name.lower()
+            if key not in names:
+                names[key] = {person_id}
+            else:
+                names[key].add(person_id)
+
+
+def load_movies(filename, movies):
+    """
+    Adds the rows of movies.csv to the `movies` dictionary.
+    """
+    for chunk in read_chunks(filename, ("id", "title", "year")):
+        for movie_id, title, year in chunk:
+            movies[movie_id] = {"title": title, "year": year, "stars": set()}
+
+
+def load_stars(filename, people, movies):
+    """
+    Adds the rows of stars.csv to the `people` and `movies` dictionaries.
+    """
+    for chunk in read_chunks(filename, ("person_id", "movie_id")):
+        add_stars(chunk, people, movies)
+
+
+def add_stars(edges, people, movies):
+    """
+    Links people and movies for each (person_id, movie_id) row.
+
+    Mirrors the serial loader, which adds a person's movie before looking
+    up the movie, and skips the rest of a row at the first unknown id.
+    """
+    for person_id, movie_id in edges:
+        person = people.get(person_id)
+        if person is None:
+            continue
+        person["movies"].add(movie_id)
+        movie = movies.get(movie_id)
+        if movie is not None:
+            movie["stars"].add(person_id)
+
+
+def read_chunks(filename, fields, size=CHUNK_SIZE):
+    """
+    Yields lists of up to `size` rows of a CSV file, each a tuple of the
+    given fields.
+    """
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        row_fields = itemgetter(*(header.index(field) for field in fields))
+        while True:
+            chunk = list(map(row_fields, islice(reader, size)))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _timed(function, *args):
+    """
+    Calls a function and returns the seconds it took.
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
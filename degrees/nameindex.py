@@ -0,0 +1,109 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from store import StringTable
+
+
+class NameIndex():
+    """
+    Prefix and trigram index over lowercase names.
+
+    Names are kept sorted in a StringTable, so the names starting with a
+    prefix are a contiguous run found by binary search. Each trigram of a
+    name, padded with spaces at both ends, maps to an array of the numbers
+    of the names containing it.
+    """
+
+    def __init__(self, names):
+        self.names = StringTable.from_strings(sorted(set(names)))
+        postings = {}
+        for i, name in enumerate(self.names):
+            for gram in trigrams(name):
+                if gram not in postings:
+                    postings[gram] = array("i")
+                postings[gram].append(i)
+        self.postings = postings
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        i = bisect_left(self.names, prefix)
+        while i < len(self.names) and len(matches) < limit:
+            name = self.names[i]
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+            i += 1
+        return matches
+
+    def fuzzy(self, query, limit=10, similarity=0.4, probes=4):
+        """
+        Returns up to `limit` (name, score) pairs for the names sharing
+        the most trigrams with `query`, best first. Scores are Dice
+        coefficients of the trigram sets, and names sharing fewer than a
+        `similarity` fraction of the query's trigrams are left out.
+
+        Candidates are read from the `probes` rarest posting lists of the
+        query's trigrams only, which bounds the work on common trigrams
+        at the cost of missing names that keep none of the rare ones.
+        Candidates are ranked by how many of those lists they appear in,
+        and only the best `limit * 10` are scored exactly.
+        """
+        grams = trigrams(query.lower())
+        if not grams:
+            return []
+        needed = max(1, math.ceil(len(grams) * similarity))
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        hits = Counter()
+        for posting in lists[:min(probes, len(grams) - needed + 1)]:
+            hits.update(posting)
+
+        scored = []
+        for i, _ in hits.most_common(limit * 10):
+            name = self.names[i]
+            name_grams = trigrams(name)
+            shared = len(grams & name_grams)
+            if shared >= needed:
+                score = 2 * shared / (len(grams) + len(name_grams))
+                scored.append((score, name))
+        return [(name, score)
+                for score, name in heapq.nlargest(limit, scored)]
+
+    def suggestions(self, query, limit=10):
+        """
+        Returns up to `limit` names for a query: names it is a prefix of
+        first, then the closest fuzzy matches.
+        """
+        matches = self.prefix(query, limit)
+        for name, _ in self.fuzzy(query, limit):
+            if len(matches) == limit:
+                break
+            if name not in matches:
+                matches.append(name)
+        return matches
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the name table and the
+        posting arrays, not counting the dictionary holding them.
+        """
+        total = len(self.names.blob)
+        total += self.names.offsets.itemsize * len(self.names.offsets)
+        for posting in self.postings.values():
+            total += posting.itemsize * len(posting)
+        return total
+
+
+def trigrams(text):
+    """
+    Returns the set of three-character substrings of a text padded with
+    two spaces in front and one behind, so that prefixes weigh more.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,150 @@
+"""
+Searches enumerating more than one path between two states.
+
+Like the searches in degrees.py, these take a `neighbors_for(state)`
+function returning the (action, state) pairs reachable from a state, and
+return paths as lists of (action, state) pairs that exclude the source.
+"""
+
+import heapq
+from collections import deque
+from itertools import count, islice
+
+
+def shortest_path_predecessors(source, target, neighbors_for):
+    """
+    Runs breadth-first search from the source until the target's layer
+    is complete, and returns a map from each state reached before the
+    target's layer, and the target itself, to the list of
+    (action, predecessor) pairs one layer closer to the source.
+
+    Returns None if the target cannot be reached.
+    """
+    predecessors = {source: []}
+    layer = [source]
+    while layer and target not in predecessors:
+        next_layer = {}
+        for state in layer:
+            for action, neighbor in neighbors_for(state):
+                if neighbor in predecessors:
+                    continue
+                if neighbor not in next_layer:
+                    next_layer[neighbor] = []
+                next_layer[neighbor].append((action, state))
+        predecessors.update(next_layer)
+        layer = list(next_layer)
+    if target not in predecessors:
+        return None
+    return predecessors
+
+
+def all_shortest_paths(source, target, neighbors_for):
+    """
+    Yields every shortest path from the source to the target, lazily.
+
+    Distances are computed once by breadth-first search; paths are then
+    walked back from the target over the predecessor map, depth first,
+    so only the path being built is held in memory.
+    """
+    predecessors = shortest_path_predecessors(source, target, neighbors_for)
+    if predecessors is None:
+        return
+
+    # Each stack entry is an iterator over the predecessors of the state
+    # at the same position of `path`, which is built target first
+    path = [(None, target)]
+    stack = [iter(predecessors[target])]
+    while stack:
+        if path[-1][1] == source:
+            yield [
+                (path[i][0], path[i - 1][1]) for i in range(len(path) - 1, 0, -1)
+            ]
+            path.pop()
+            stack.pop()
+            continue
+        step = next(stack[-1], None)
+        if step is None:
+            path.pop()
+            stack.pop()
+        else:
+            path.append(step)
+            stack.append(iter(predecessors[step[1]]))
+
+
+def k_shortest_paths(source, target, neighbors_for, k):
+    """
+    Yields up to `k` shortest loopless paths from the source to the
+    target, in order of length.
+
+    Every shortest path is taken from `all_shortest_paths`; if there are
+    fewer than `k`, longer paths follow by Yen's algorithm, which deviates
+    from the paths found so far at each of their states.
+    """
+    found = []
+    for path in islice(all_shortest_paths(source, target, neighbors_for), k):
+        found.append(path)
+        yield path
+    if not found or len(found) == k:
+        return
+
+    seen = {tuple(path) for path in found}
+    candidates = []
+    tiebreak = count()
+
+    def deviate(path):
+        states = [source] + [state for _, state in path]
+        for i in range(len(path)):
+            root = path[:i]
+            banned_states = set(states[:i])
+            banned_steps = {
+                other[i] for other in found
+                if len(other) > i and other[:i] == root
+            }
+            spur = _restricted_path(
+                states[i], target, neighbors_for, banned_states, banned_steps
+            )
+            if spur is None:
+                continue
+            candidate = root + spur
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(
+                    candidates, (len(candidate), next(tiebreak), candidate)
+                )
+
+    for path in found:
+        deviate(path)
+    while len(found) < k and candidates:
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+        yield path
+        deviate(path)
+
+
+def _restricted_path(source, target, neighbors_for,
+                     banned_states, banned_steps):
+    """
+    Returns a shortest path from the source to the target that visits
+    none of `banned_states` and does not leave the source by any of the
+    (action, state) pairs in `banned_steps`, or None if there is none.
+    """
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        state = queue.popleft()
+        if state == target:
+            path = []
+            while parents[state] is not None:
+                action, parent = parents[state]
+                path.append((action, state))
+                state = parent
+            path.reverse()
+            return path
+        for action, neighbor in neighbors_for(state):
+            if neighbor in parents or neighbor in banned_states:
+                continue
+            if state == source and (action, neighbor) in banned_steps:
+                continue
+            parents[neighbor] = (action, state)
+            queue.append(neighbor)
+    return None
@@ -0,0 +1,223 @@
+"""
+Batch and server front ends answering many degrees queries against data
+loaded once.
+
+Both take an `answer(query)` function, which turns a (source name,
+target name) pair into a JSON-ready dict, and fan queries out over a pool
+of worker processes. Workers are forked from the process that loaded the
+data, so they share it without reloading or pickling it.
+"""
+
+import csv
+import json
+import os
+import multiprocessing
+import signal
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def read_queries(lines):
+    """
+    Yields (source, target) name pairs from lines of CSV text,
+    skipping blank lines. Names containing commas may be quoted.
+    """
+    for row in csv.reader(lines):
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) != 2:
+            yield None
+        else:
+            yield (row[0].strip(), row[1].strip())
+
+
+def run_batch(answer, lines, output, workers=None):
+    """
+    Answers every query in `lines`, writing one JSON object per line to
+    `output` in input order, and reports throughput to stderr.
+    """
+    start = time.perf_counter()
+    count = 0
+    with Workers(answer, workers) as pool:
+        for response in pool.imap(read_queries(lines)):
+            output.write(json.dumps(response) + "\n")
+            output.flush()
+            count += 1
+    _report(count, time.perf_counter() - start)
+
+
+def serve(answer, address, workers=None):
+    """
+    Answers queries until interrupted or terminated, over HTTP when
+    `address` is HOST:PORT, or over a Unix socket when it is unix:PATH.
+
+    Over HTTP, queries are GET /path?source=NAME&target=NAME. Over a Unix
+    socket, each line sent is a 'source,target' query and each line
+    received is its JSON answer.
+    """
+    with Workers(answer, workers) as pool:
+        if address.startswith("unix:"):
+            server = socketserver.ThreadingUnixStreamServer(
+                address[len("unix:"):], _unix_handler(pool)
+            )
+        else:
+            host, _, port = address.rpartition(":")
+            server = ThreadingHTTPServer(
+                (host or "localhost", int(port)), _http_handler(pool)
+            )
+        server.daemon_threads = True
+
+        # Stop on SIGTERM as on Ctrl-C; the workers, already forked,
+        # keep the default handler so that the pool can terminate them
+        previous = signal.signal(signal.SIGTERM, _interrupt)
+        print(f"Serving on {address}", file=sys.stderr)
+        start = time.perf_counter()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            server.server_close()
+            if address.startswith("unix:"):
+                os.remove(address[len("unix:"):])
+        _report(pool.count, time.perf_counter() - start)
+
+
+class Workers():
+    """
+    Pool of forked worker processes answering queries, or the current
+    process when a single worker is asked for. Counts answered queries.
+    """
+
+    def __init__(self, answer, workers=None):
+        self.answer = Guarded(answer)
+        self.workers = workers
+        self.pool = None
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        if self.workers != 1:
+            context = multiprocessing.get_context("fork")
+            self.pool = context.Pool(self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+
+    def imap(self, queries):
+        """
+        Yields the answers to an iterable of queries, in order.
+        """
+        if self.pool is None:
+            responses = map(self.answer, queries)
+        else:
+            responses = self.pool.imap(self.answer, queries, chunksize=16)
+        for response in responses:
+            self._counted()
+            yield response
+
+    def apply(self, query):
+        """
+        Returns the answer to a single query.
+        """
+        if self.pool is None:
+            response = self.answer(query)
+        else:
+            response = self.pool.apply(self.answer, (query,))
+        self._counted()
+        return response
+
+    def _counted(self):
+        with self.lock:
+            self.count += 1
+
+
+class Guarded():
+    """
+    Picklable wrapper of an answer function that answers malformed
+    queries, read as None, with an error instead of calling it.
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def __call__(self, query):
+        if query is None:
+            return {"error": "Expected a 'source,target' query."}
+        return self.answer(query)
+
+
+def _http_handler(pool):
+    """
+    Returns an HTTP request handler class answering queries with `pool`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if (url.path != "/path"
+                    or len(params.get("source", [])) != 1
+                    or len(params.get("target", [])) != 1):
+                self._send(400, {
+                    "error": "Expected GET /path?source=NAME&target=NAME."
+                })
+                return
+            response = pool.apply((params["source"][0], params["target"][0]))
+            self._send(404 if "error" in response else 200, response)
+
+        def _send(self, status, response):
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _unix_handler(pool):
+    """
+    Returns a stream request handler class answering one query per line
+    with `pool`.
+    """
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            lines = (line.decode("utf-8") for line in self.rfile)
+            for query in read_queries(lines):
+                response = pool.apply(query)
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    return Handler
+
+
+def _interrupt(signum, frame):
+    """
+    Signal handler raising KeyboardInterrupt.
+    """
+    raise KeyboardInterrupt
+
+
+def _report(count, elapsed):
+    """
+    Prints the number of queries answered and the throughput to stderr.
+    """
+    rate = count / elapsed if elapsed else 0
+    print(f"{count} queries in {elapsed:.2f}s ({rate:.1f} queries/sec)",
+          file=sys.stderr)
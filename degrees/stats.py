@@ -0,0 +1,69 @@
+"""
+Single-source distance statistics over the star graph.
+
+Like the searches in degrees.py, these take a `neighbors_for(state)`
+function returning the (action, state) pairs reachable from a state.
+"""
+
+import multiprocessing
+from collections import Counter
+
+
+def distance_layers(source, neighbors_for, max_depth=None):
+    """
+    Yields the layers of a breadth-first search from the source: lists
+    of the states at distance 0, 1, 2, ... up to `max_depth` if given.
+    """
+    seen = {source}
+    layer = [source]
+    depth = 0
+    while layer:
+        yield layer
+        if depth == max_depth:
+            return
+        next_layer = []
+        for state in layer:
+            for _, neighbor in neighbors_for(state):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    next_layer.append(neighbor)
+        layer = next_layer
+        depth += 1
+
+
+def distance_counts(source, neighbors_for, max_depth=None):
+    """
+    Returns a list whose item `d` is the number of states at distance
+    `d` from the source.
+    """
+    return [len(layer)
+            for layer in distance_layers(source, neighbors_for, max_depth)]
+
+
+def sample_histogram(counts_for, sources, population, workers=None):
+    """
+    Aggregates the distance counts of many sampled sources, computed by
+    `counts_for(source)` in a pool of forked worker processes.
+
+    Returns a dict with the number of (source, other) pairs at each
+    distance, the pairs that are not connected, and how many sources
+    had each eccentricity (largest distance reached). `population` is
+    the number of states in the graph.
+    """
+    histogram = Counter()
+    eccentricities = Counter()
+    unreachable = 0
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for counts in pool.imap_unordered(counts_for, sources, chunksize=4):
+            for distance, count in enumerate(counts):
+                if distance:
+                    histogram[distance] += count
+            eccentricities[len(counts) - 1] += 1
+            unreachable += population - sum(counts)
+    return {
+        "sources": len(sources),
+        "histogram": dict(sorted(histogram.items())),
+        "unreachable": unreachable,
+        "eccentricities": dict(sorted(eccentricities.items()))
+    }
@@ -0,0 +1,470 @@
+import csv
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from itertools import accumulate
+
+# Snapshot files start with this tag, which changes with the layout
+SNAPSHOT_MAGIC = b"DEGSNAP1"
+
+# Default snapshot file name, inside the data directory
+SNAPSHOT_NAME = ".degrees.snapshot"
+
+# CSV files whose size and mtime key a snapshot
+SOURCE_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# GraphStore attributes saved in a snapshot
+STRING_TABLES = ("person_ids", "person_names", "person_births",
+                 "movie_ids", "movie_titles", "movie_years")
+COLUMNS = ("person_order", "movie_order", "name_order",
+           "person_offsets", "person_movies", "movie_offsets", "movie_stars")
+
+
+class StringTable():
+    """
+    Immutable sequence of strings stored as one UTF-8 blob, where string
+    `i` is `blob[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = array("q", [0])
+        offsets.extend(accumulate(len(string) for string in encoded))
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class GraphStore():
+    """
+    Compact store of the people/movies star graph.
+
+    Person and movie ids are interned to dense integers: person `i` has id
+    `person_ids[i]`. Every string column is a StringTable, and the
+    bipartite star graph is kept in CSR form in both directions, so the
+    movies of person `i` are `person_movies[person_offsets[i]:
+    person_offsets[i + 1]]` and the stars of movie `j` are
+    `movie_stars[movie_offsets[j]:movie_offsets[j + 1]]`.
+
+    Ids and lowercase names are looked up by binary search over the
+    permutations `person_order`, `movie_order` and `name_order`, instead
+    of through dictionaries holding every string.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_order, movie_order, name_order,
+                 person_offsets, person_movies, movie_offsets, movie_stars):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        self.person_index = IdIndex(person_ids, person_order)
+        self.movie_index = IdIndex(movie_ids, movie_order)
+        self.people = PeopleView(self)
+        self.movies = MoviesView(self)
+        self.names = NamesView(self)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Loads the store from the CSV files in a directory.
+        """
+        person_ids, person_names, person_births = _read_columns(
+            f"{directory}/people.csv", ("id", "name", "birth")
+        )
+        movie_ids, movie_titles, movie_years = _read_columns(
+            f"{directory}/movies.csv", ("id", "title", "year")
+        )
+        star_people, star_movies = _read_columns(
+            f"{directory}/stars.csv", ("person_id", "movie_id")
+        )
+
+        # Intern the star edges, skipping rows that name unknown ids, and
+        # encode each edge as one integer so duplicates sort together
+        person_number = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_number = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = []
+        for person_id, movie_id in zip(star_people, star_movies):
+            person = person_number.get(person_id)
+            movie = movie_number.get(movie_id)
+            if person is not None and movie is not None:
+                edges.append((person, movie))
+        del person_number, movie_number, star_people, star_movies
+
+        n_people, n_movies = len(person_ids), len(movie_ids)
+        person_offsets, person_movies = _csr(
+            sorted(set(person * n_movies + movie for person, movie in edges)),
+            n_people, n_movies
+        )
+        movie_offsets, movie_stars = _csr(
+            sorted(set(movie * n_people + person for person, movie in edges)),
+            n_movies, n_people
+        )
+        del edges
+
+        lowercase = [name.lower() for name in person_names]
+        return cls(
+            StringTable.from_strings(person_ids),
+            StringTable.from_strings(person_names),
+            StringTable.from_strings(person_births),
+            StringTable.from_strings(movie_ids),
+            StringTable.from_strings(movie_titles),
+            StringTable.from_strings(movie_years),
+            array("i", sorted(range(n_people), key=person_ids.__getitem__)),
+            array("i", sorted(range(n_movies), key=movie_ids.__getitem__)),
+            array("i", sorted(range(n_people), key=lowercase.__getitem__)),
+            person_offsets, person_movies, movie_offsets, movie_stars
+        )
+
+    @classmethod
+    def load_cached(cls, directory, filename=None):
+        """
+        Loads the store from a snapshot of a directory's CSV files,
+        rebuilding and saving the snapshot first if it is missing or
+        older than the CSV files.
+        """
+        if filename is None:
+            filename = os.path.join(directory, SNAPSHOT_NAME)
+        key = source_key(directory)
+        try:
+            return cls.open_snapshot(filename, key)
+        except (OSError, ValueError):
+            pass
+
+        store = cls.load(directory)
+        try:
+            store.save_snapshot(filename, key)
+        except OSError:
+            # A read-only data directory only costs the cache
+            pass
+        return store
+
+    @classmethod
+    def open_snapshot(cls, filename, key):
+        """
+        Memory-maps a snapshot file written by `save_snapshot`.
+
+        Raises ValueError if the file is not a snapshot, is corrupt or was
+        written for a different `key`.
+        """
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+
+        magic = bytes(view[:len(SNAPSHOT_MAGIC)])
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{filename} is not a degrees snapshot")
+        start = len(SNAPSHOT_MAGIC) + 8
+        size = int.from_bytes(view[len(SNAPSHOT_MAGIC):start], "little")
+        header = json.loads(bytes(view[start:start + size]))
+        if not isinstance(header, dict) or "sections" not in header:
+            raise ValueError(f"{filename} has a corrupt header")
+        if header.get("key") != key:
+            raise ValueError(f"{filename} is stale")
+
+        start = _aligned(start + size)
+        sections = {}
+        try:
+            for name, typecode, offset, length in header["sections"]:
+                offset += start
+                if offset < start or offset + length > len(view):
+                    raise ValueError(f"{filename} is truncated")
+                sections[name] = view[offset:offset + length].cast(typecode)
+        except TypeError as e:
+            raise ValueError(f"{filename} has a corrupt section") from e
+        missing = ({f"{name}.{part}" for name in STRING_TABLES
+                    for part in ("blob", "offsets")}
+                   | set(COLUMNS)) - sections.keys()
+        if missing:
+            raise ValueError(f"{filename} lacks {', '.join(sorted(missing))}")
+        return cls(
+            *(StringTable(sections[f"{name}.blob"], sections[f"{name}.offsets"])
+              for name in STRING_TABLES),
+            *(sections[name] for name in COLUMNS)
+        )
+
+    def save_snapshot(self, filename, key):
+        """
+        Writes the store's tables to a snapshot file that `open_snapshot`
+        can map back in without parsing, tagged with `key`.
+        """
+        sections = []
+        for name in STRING_TABLES:
+            table = getattr(self, name)
+            sections.append((f"{name}.blob", memoryview(table.blob)))
+            sections.append((f"{name}.offsets", memoryview(table.offsets)))
+        for name in COLUMNS:
+            sections.append((name, memoryview(getattr(self, name))))
+
+        # Sections follow the header, each aligned to 8 bytes, at offsets
+        # relative to the end of the header
+        header = {"key": key, "sections": []}
+        offset = 0
+        for name, data in sections:
+            header["sections"].append([name, data.format, offset, data.nbytes])
+            offset += _aligned(data.nbytes)
+        encoded = json.dumps(header).encode("utf-8")
+        start = _aligned(len(SNAPSHOT_MAGIC) + 8 + len(encoded))
+
+        # Write to a temporary file and rename it, so readers never map
+        # a half-written snapshot
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(len(encoded).to_bytes(8, "little"))
+                f.write(encoded)
+                for (_, data), section in zip(sections, header["sections"]):
+                    f.write(b"\0" * (start + section[2] - f.tell()))
+                    f.write(data)
+            os.replace(temporary, filename)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def movies_of(self, person):
+        """
+        Returns the interned movies of an interned person.
+        """
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def stars_of(self, movie):
+        """
+        Returns the interned stars of an interned movie.
+        """
+        return self.movie_stars[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) pairs of interned ids for people
+        who starred with a given interned person.
+        """
+        return [(movie, star)
+                for movie in self.movies_of(person)
+                for star in self.stars_of(movie)]
+
+    def people_named(self, name):
+        """
+        Returns the interned people whose lowercase name is `name`.
+        """
+        names = self.person_names
+
+        def key(person):
+            return names[person].lower()
+
+        start = bisect_left(self.name_order, name, key=key)
+        end = bisect_right(self.name_order, name, lo=start, key=key)
+        return self.name_order[start:end]
+
+    def decode_path(self, path):
+        """
+        Converts a path of interned (movie, person) pairs back to
+        (movie_id, person_id) pairs. Returns None for a missing path.
+        """
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the store's tables.
+        """
+        total = 0
+        for table in (self.person_ids, self.person_names, self.person_births,
+                      self.movie_ids, self.movie_titles, self.movie_years):
+            total += len(table.blob) + _nbytes(table.offsets)
+        for column in (self.person_order, self.movie_order, self.name_order,
+                       self.person_offsets, self.person_movies,
+                       self.movie_offsets, self.movie_stars):
+            total += _nbytes(column)
+        return total
+
+
+class IdIndex(Mapping):
+    """
+    Read-only mapping from an id string to its interned integer, by binary
+    search over `ids` in the order given by the permutation `order`.
+    """
+
+    def __init__(self, ids, order):
+        self.ids = ids
+        self.order = order
+
+    def __getitem__(self, key):
+        i = bisect_left(self.order, key, key=self.ids.__getitem__)
+        if i < len(self.order) and self.ids[self.order[i]] == key:
+            return self.order[i]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a GraphStore shaped like the `people` dictionary.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, person_id):
+        store = self.store
+        person = store.person_index[person_id]
+        return {
+            "name": store.person_names[person],
+            "birth": store.person_births[person],
+            "movies": {store.movie_ids[movie]
+                       for movie in store.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.store.person_ids)
+
+    def __len__(self):
+        return len(self.store.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a GraphStore shaped like the `movies` dictionary.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, movie_id):
+        store = self.store
+        movie = store.movie_index[movie_id]
+        return {
+            "title": store.movie_titles[movie],
+            "year": store.movie_years[movie],
+            "stars": {store.person_ids[person]
+                      for person in store.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.store.movie_ids)
+
+    def __len__(self):
+        return len(self.store.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a GraphStore shaped like the `names` dictionary.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        store = self.store
+        people = store.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return {store.person_ids[person] for person in people}
+
+    def __iter__(self):
+        names = self.store.person_names
+        previous = None
+        for person in self.store.name_order:
+            name = names[person].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def source_key(directory):
+    """
+    Returns the size and modification time of each CSV file in a
+    directory, which identifies the data a snapshot was built from.
+    """
+    key = {}
+    for name in SOURCE_FILES:
+        stat = os.stat(os.path.join(directory, name))
+        key[name] = [stat.st_size, stat.st_mtime_ns]
+    return key
+
+
+def _read_columns(filename, fields):
+    """
+    Returns one list per field with that column of a CSV file.
+    """
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(field) for field in fields]
+        columns = tuple([] for _ in fields)
+        for row in reader:
+            for column, position in zip(columns, positions):
+                column.append(row[position])
+    return columns
+
+
+def _csr(keys, n_rows, n_columns):
+    """
+    Returns (offsets, indices) arrays for sorted, unique edge keys
+    encoded as `row * n_columns + column`.
+    """
+    offsets = array("q", [0] * (n_rows + 1))
+    indices = array("i", [0] * len(keys))
+    for i, key in enumerate(keys):
+        row, indices[i] = divmod(key, n_columns)
+        offsets[row + 1] += 1
+    for row in range(n_rows):
+        offsets[row + 1] += offsets[row]
+    return offsets, indices
+
+
+def _aligned(length):
+    """
+    Rounds a length up to a multiple of 8 bytes.
+    """
+    return (length + 7) // 8 * 8
+
+
+def _nbytes(column):
+    """
+    Returns the number of bytes held by an array.
+    """
+    return column.itemsize * len(column)
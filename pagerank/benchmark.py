@@ -0,0 +1,530 @@
+"""
+Benchmarks for the PageRank engines.
+
+Usage: python benchmark.py iterate [--pages N] [--large-pages N]
+       python benchmark.py sample [--samples N] [--surfers N]
+       python benchmark.py crawl [--pages N] [--workers N] [--repeat N]
+       python benchmark.py update [--pages N] [--changed FRACTION]
+       python benchmark.py converge [--pages N] [--tolerance T]
+       python benchmark.py personalized [--pages N] [--vectors N]
+       python benchmark.py suite [--generator NAME] [--pages N [N ...]]
+                                 [--format {memory,html}] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import crawler
+import pagerank
+import sampling
+import sparse
+
+CORPORA = ("corpus0", "corpus1", "corpus2")
+
+
+def random_corpus(pages, links, seed=0):
+    """
+    Returns a corpus dictionary of `pages` pages named "0.html", ...,
+    each linking to about `links` other pages chosen uniformly.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = {}
+    for i, name in enumerate(names):
+        targets = rng.integers(0, pages, rng.poisson(links))
+        corpus[name] = {names[j] for j in targets.tolist() if j != i}
+    return corpus
+
+
+def preferential_corpus(pages, links, seed=0):
+    """
+    Returns a corpus dictionary like `random_corpus` grown by preferential
+    attachment: each page links to about `links` earlier pages, chosen
+    with probability proportional to one more than their links so far.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = {}
+    # One entry per page and per link to it, to draw targets from
+    targets = []
+    for i, name in enumerate(names):
+        if targets:
+            count = min(int(rng.expovariate(1 / links) + 0.5), i)
+            corpus[name] = {names[rng.choice(targets)] for _ in range(count)}
+        else:
+            corpus[name] = set()
+        targets.extend(int(link.split(".")[0]) for link in corpus[name])
+        targets.append(i)
+    return corpus
+
+
+def dangling_corpus(pages, links, dangling=0.5, seed=0):
+    """
+    Returns a corpus dictionary like `random_corpus` in which a fraction
+    `dangling` of the pages have no links.
+    """
+    corpus = random_corpus(pages, links, seed)
+    rng = np.random.default_rng(seed + 1)
+    for i in np.flatnonzero(rng.random(pages) < dangling).tolist():
+        corpus[f"{i}.html"] = set()
+    return corpus
+
+
+# Synthetic corpus generators of the benchmark suite, by name
+GENERATORS = {
+    "erdos-renyi": random_corpus,
+    "preferential": preferential_corpus,
+    "dangling": dangling_corpus
+}
+
+
+def random_graph(pages, links, seed=0):
+    """
+    Returns a LinkGraph like `random_corpus`, built directly from arrays
+    so that millions of pages fit in memory. Links may repeat or point
+    back to their own page.
+    """
+    rng = np.random.default_rng(seed)
+    degrees = rng.poisson(links, pages)
+    indptr = np.concatenate(([0], np.cumsum(degrees)))
+    indices = rng.integers(0, pages, indptr[-1], dtype=np.int32)
+    names = [f"{i}.html" for i in range(pages)]
+    return sparse.LinkGraph(names, indptr, indices)
+
+
+def clustered_graph(pages, links, bridges=0.001, seed=0):
+    """
+    Returns a LinkGraph like `random_graph` whose two halves only link to
+    each other with probability `bridges` per link, so that power
+    iteration converges slowly.
+    """
+    rng = np.random.default_rng(seed)
+    degrees = rng.poisson(links, pages)
+    indptr = np.concatenate(([0], np.cumsum(degrees)))
+    sources = np.repeat(np.arange(pages), degrees)
+    half = pages // 2
+    indices = np.where(sources < half,
+                       rng.integers(0, half, len(sources)),
+                       rng.integers(half, pages, len(sources)))
+    bridge = rng.random(len(sources)) < bridges
+    indices[bridge] = rng.integers(0, pages, bridge.sum())
+    names = [f"{i}.html" for i in range(pages)]
+    return sparse.LinkGraph(names, indptr, indices)
+
+
+def write_corpus(corpus, directory):
+    """
+    Writes a corpus dictionary as one HTML file per page, in the layout
+    of the provided corpora.
+    """
+    for page, links in corpus.items():
+        items = "\n".join(
+            f'            <li><a href="{link}">{link}</a></li>'
+            for link in sorted(links)
+        )
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"""<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{page}</title>
+    </head>
+    <body>
+        <h1>{page}</h1>
+
+        <div>Links:</div>
+        <ul>
+{items}
+        </ul>
+    </body>
+</html>
+""")
+
+
+def timed(function, *args):
+    """
+    Returns the result of calling a function, and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def measured(function, *args, memory=True):
+    """
+    Returns the result of calling a function, and a dictionary of the
+    "seconds" it took and, if `memory`, of the "peak_bytes" allocated
+    above what was allocated before the call, measured by tracemalloc in
+    a second, untimed call.
+    """
+    result, seconds = timed(function, *args)
+    measurement = {"seconds": seconds}
+    if memory:
+        tracemalloc.start()
+        try:
+            function(*args)
+            measurement["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, measurement
+
+
+def run_suite(corpus, format, samples, python_samples, memory=True):
+    """
+    Times crawling (for HTML corpora), sampling and iterating a corpus
+    with each engine, and returns a list of the measurements.
+    """
+    results = []
+
+    def measure(phase, engine, function, *args):
+        result, measurement = measured(function, *args, memory=memory)
+        results.append({"phase": phase, "engine": engine, **measurement})
+        print(f"  {phase:>9} {engine:>10}: {measurement['seconds']:>9.3f}s"
+              + (f", peak {measurement['peak_bytes'] / 2 ** 20:>8.1f} MiB"
+                 if memory else ""), file=sys.stderr)
+        return result
+
+    if format == "html":
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(corpus, directory)
+            corpus = measure("crawl", "python", pagerank.crawl, directory)
+            graph = measure("crawl", "streaming", crawler.crawl_graph,
+                            directory)
+    else:
+        graph = measure("intern", "sparse", sparse.LinkGraph.from_corpus,
+                        corpus)
+
+    damping = pagerank.DAMPING
+    measure("sample", "python", pagerank.sample_pagerank, corpus, damping,
+            python_samples)
+    measure("sample", "tables", sampling.sample_graph, graph, damping,
+            samples)
+    measure("sample", "vectorized", sampling.sample_graph, graph, damping,
+            samples, 1000)
+    measure("iterate", "python", pagerank.iterate_pagerank, corpus, damping)
+    # A fresh graph each time, so the traced run also builds the matrix
+    measure("iterate", "sparse", lambda: sparse.power_iteration(
+        sparse.LinkGraph(graph.pages, graph.indptr, graph.indices), damping
+    ))
+    return results
+
+
+def benchmark_suite(args):
+    """
+    Runs the benchmark suite over synthetic corpora of each generator and
+    size, and writes the results as JSON.
+    """
+    generators = list(GENERATORS) if args.generator == "all" else [
+        args.generator
+    ]
+    runs = []
+    for name in generators:
+        for pages in args.pages:
+            print(f"{name}, {pages} pages ({args.format})", file=sys.stderr)
+            corpus = GENERATORS[name](pages, args.links, seed=args.seed)
+            runs.append({
+                "generator": name,
+                "pages": pages,
+                "links": sum(len(links) for links in corpus.values()),
+                "dangling": sum(not links for links in corpus.values()),
+                "format": args.format,
+                "results": run_suite(corpus, args.format, args.samples,
+                                     args.python_samples, args.memory)
+            })
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "samples": args.samples,
+        "python_samples": args.python_samples,
+        "runs": runs
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+def benchmark_iterate(args):
+    """
+    Times `iterate_pagerank` against the sparse engine on the provided
+    corpora and on synthetic ones.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    corpora = [(name, pagerank.crawl(os.path.join(directory, name)))
+               for name in CORPORA]
+    corpora.append((f"random ({args.pages} pages)",
+                    random_corpus(args.pages, args.links)))
+
+    for name, corpus in corpora:
+        expected, python_time = timed(
+            pagerank.iterate_pagerank, corpus, pagerank.DAMPING
+        )
+        ranks, sparse_time = timed(
+            sparse.iterate_pagerank, corpus, pagerank.DAMPING
+        )
+        error = max(abs(ranks[page] - expected[page]) for page in corpus)
+        print(f"{name:>28}: python {python_time * 1000:>10.2f} ms, "
+              f"sparse {sparse_time * 1000:>8.2f} ms, "
+              f"max difference {error:.5f}")
+
+    graph, build_time = timed(random_graph, args.large_pages, args.links)
+    _, sparse_time = timed(sparse.power_iteration, graph, pagerank.DAMPING)
+    print(f"{f'random ({args.large_pages} pages)':>28}: sparse "
+          f"{sparse_time * 1000:>8.2f} ms "
+          f"(graph built in {build_time * 1000:.2f} ms)")
+
+
+def benchmark_sample(args):
+    """
+    Times `sample_pagerank` against the table-driven and vectorized
+    samplers on the provided corpora.
+
+    The original sampler takes `--baseline-samples` samples; its time is
+    scaled up to `--samples` for comparison.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in CORPORA:
+        corpus = pagerank.crawl(os.path.join(directory, name))
+        _, baseline_time = timed(pagerank.sample_pagerank, corpus,
+                                 pagerank.DAMPING, args.baseline_samples)
+        baseline_time *= args.samples / args.baseline_samples
+        _, walk_time = timed(sampling.sample_pagerank, corpus,
+                             pagerank.DAMPING, args.samples)
+        _, surf_time = timed(sampling.sample_pagerank, corpus,
+                             pagerank.DAMPING, args.samples, args.surfers)
+        print(f"{name:>8}, {args.samples} samples: "
+              f"python ~{baseline_time:>7.3f}s, tables {walk_time:>7.3f}s, "
+              f"vectorized {surf_time:>7.3f}s")
+
+
+def benchmark_crawl(args):
+    """
+    Times `crawl` against the concurrent streaming crawler on a synthetic
+    HTML corpus, best of `--repeat` runs each, and saving and loading the
+    crawled graph.
+    """
+    corpus = random_corpus(args.pages, args.links)
+    crawl_time = graph_time = float("inf")
+    with tempfile.TemporaryDirectory() as directory:
+        write_corpus(corpus, directory)
+        for _ in range(args.repeat):
+            expected, seconds = timed(pagerank.crawl, directory)
+            crawl_time = min(crawl_time, seconds)
+            graph, seconds = timed(crawler.crawl_graph, directory,
+                                   args.workers)
+            graph_time = min(graph_time, seconds)
+        assert graph.to_corpus() == expected
+
+        filename = os.path.join(directory, "graph.npz")
+        _, save_time = timed(graph.save, filename)
+        _, load_time = timed(sparse.LinkGraph.load, filename)
+        size = os.path.getsize(filename)
+
+    print(f"{args.pages} pages: crawl {crawl_time:.2f}s, "
+          f"crawl_graph {graph_time:.2f}s "
+          f"({crawl_time / graph_time:.2f}x)")
+    print(f"  saved graph: {size / 2 ** 20:.2f} MiB, "
+          f"saved in {save_time * 1000:.1f} ms, "
+          f"loaded in {load_time * 1000:.1f} ms")
+
+
+def random_changes(corpus, fraction, links, seed=0):
+    """
+    Returns random changes to `fraction` of the pages of a corpus: a
+    corpus dictionary of the pages added or modified, and the set of
+    pages removed. An eighth of the changes are removals and an eighth
+    additions.
+    """
+    rng = np.random.default_rng(seed)
+    names = sorted(corpus)
+    count = max(int(len(names) * fraction), 8)
+    changed = [names[i] for i in
+               rng.choice(len(names), count, replace=False).tolist()]
+    removed = set(changed[:count // 8])
+    pages = changed[count // 8:]
+    pages[:count // 8] = [f"new{i}.html" for i in range(count // 8)]
+    targets = names + pages
+    return {
+        page: {targets[j] for j in
+               rng.integers(0, len(targets), rng.poisson(links)).tolist()}
+        for page in pages
+    }, removed
+
+
+def benchmark_update(args):
+    """
+    Times an update of a saved graph for changed pages of a synthetic
+    HTML corpus, with power iteration warm-started from the saved ranks,
+    against crawling and ranking the changed corpus from scratch.
+    """
+    corpus = random_corpus(args.pages, args.links)
+    with tempfile.TemporaryDirectory() as directory:
+        write_corpus(corpus, directory)
+        graph = crawler.crawl_graph(directory)
+        ranks = sparse.power_iteration(graph, pagerank.DAMPING, args.tolerance)
+        since = time.time_ns()
+
+        changes, removed = random_changes(corpus, args.changed, args.links)
+        for page in removed:
+            os.remove(os.path.join(directory, page))
+        write_corpus(changes, directory)
+        # File times may be coarser than the clock `since` was read from
+        for page in changes:
+            os.utime(os.path.join(directory, page),
+                     ns=(since + 1, since + 1))
+
+        changed, changed_time = timed(crawler.changed_pages, directory,
+                                      graph, since)
+        updated, update_time = timed(crawler.update_graph, directory,
+                                     graph, changed)
+        start, carry_time = timed(sparse.carry_ranks, graph, ranks, updated)
+        warm, warm_time = timed(sparse.power_iteration, updated,
+                                pagerank.DAMPING, args.tolerance, start)
+
+        fresh, crawl_time = timed(crawler.crawl_graph, directory)
+        cold, cold_time = timed(sparse.power_iteration, fresh,
+                                pagerank.DAMPING, args.tolerance)
+
+    assert updated.to_corpus() == fresh.to_corpus()
+    incremental = changed_time + update_time + carry_time + warm_time
+    print(f"{args.pages} pages, {len(changed)} changed: "
+          f"from scratch {(crawl_time + cold_time) * 1000:.0f} ms "
+          f"(crawl {crawl_time * 1000:.0f} ms, "
+          f"iteration {cold_time * 1000:.0f} ms)")
+    print(f"  incremental {incremental * 1000:.0f} ms "
+          f"(find changes {changed_time * 1000:.0f} ms, "
+          f"update {update_time * 1000:.0f} ms, "
+          f"carry ranks {carry_time * 1000:.0f} ms, "
+          f"iteration {warm_time * 1000:.0f} ms), "
+          f"max difference {np.abs(warm - cold).max():.2e}")
+
+
+def benchmark_converge(args):
+    """
+    Compares the sweeps and time taken by each iteration method to reach
+    a tolerance on synthetic graphs.
+    """
+    graphs = [("random", random_graph(args.pages, args.links)),
+              ("clustered", clustered_graph(args.pages, args.links))]
+    for name, graph in graphs:
+        graph.matrix()
+        for method in ("power", "gauss-seidel", "aitken"):
+            result, seconds = timed(
+                lambda: sparse.solve(graph, pagerank.DAMPING, args.tolerance,
+                                     args.norm, method=method)
+            )
+            print(f"{name:>9} {method:>12}: {result['iterations']:>4} sweeps, "
+                  f"{seconds * 1000:>8.1f} ms")
+
+
+def benchmark_personalized(args):
+    """
+    Times a batch of personalized PageRank vectors, each teleporting to a
+    few random pages, against solving one of them and against solving
+    them one at a time.
+    """
+    graph = random_graph(args.pages, args.links)
+    graph.matrix()
+    rng = np.random.default_rng(0)
+    teleport = np.zeros((args.pages, args.vectors))
+    for column in range(args.vectors):
+        teleport[rng.integers(0, args.pages, args.topic_pages), column] = 1
+
+    def solve(columns):
+        return sparse.personalized_iteration(graph, pagerank.DAMPING,
+                                             columns, args.tolerance)
+
+    _, single_time = timed(solve, teleport[:, :1])
+    batch, batch_time = timed(solve, teleport)
+    _, loop_time = timed(
+        lambda: [solve(teleport[:, [i]]) for i in range(args.vectors)]
+    )
+    print(f"{args.pages} pages: one vector {single_time * 1000:.0f} ms, "
+          f"{args.vectors} vectors batched {batch_time * 1000:.0f} ms "
+          f"({batch_time / args.vectors * 1000:.1f} ms per vector), "
+          f"one at a time {loop_time * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    iterate = commands.add_parser("iterate", help="python vs sparse iteration")
+    iterate.add_argument("--pages", type=int, default=500)
+    iterate.add_argument("--large-pages", type=int, default=1000000)
+    iterate.add_argument("--links", type=float, default=8)
+    iterate.set_defaults(run=benchmark_iterate)
+
+    sample = commands.add_parser("sample", help="sampler throughput")
+    sample.add_argument("--samples", type=int, default=1000000)
+    sample.add_argument("--baseline-samples", type=int, default=10000)
+    sample.add_argument("--surfers", type=int, default=1000)
+    sample.set_defaults(run=benchmark_sample)
+
+    crawl = commands.add_parser("crawl", help="crawler throughput")
+    crawl.add_argument("--pages", type=int, default=100000)
+    crawl.add_argument("--links", type=float, default=8)
+    crawl.add_argument("--workers", type=int, default=None)
+    crawl.add_argument("--repeat", type=int, default=3)
+    crawl.set_defaults(run=benchmark_crawl)
+
+    update = commands.add_parser("update", help="incremental vs full ranking")
+    update.add_argument("--pages", type=int, default=100000)
+    update.add_argument("--links", type=float, default=8)
+    update.add_argument("--changed", type=float, default=0.01,
+                        help="fraction of pages changed")
+    update.add_argument("--tolerance", type=float, default=1e-10)
+    update.set_defaults(run=benchmark_update)
+
+    converge = commands.add_parser("converge", help="iteration methods")
+    converge.add_argument("--pages", type=int, default=100000)
+    converge.add_argument("--links", type=float, default=8)
+    converge.add_argument("--tolerance", type=float, default=1e-10)
+    converge.add_argument("--norm", default="l1", choices=sorted(sparse.NORMS))
+    converge.set_defaults(run=benchmark_converge)
+
+    personalized = commands.add_parser("personalized",
+                                       help="batched personalized PageRank")
+    personalized.add_argument("--pages", type=int, default=100000)
+    personalized.add_argument("--links", type=float, default=8)
+    personalized.add_argument("--vectors", type=int, default=128)
+    personalized.add_argument("--topic-pages", type=int, default=10)
+    personalized.add_argument("--tolerance", type=float, default=1e-8)
+    personalized.set_defaults(run=benchmark_personalized)
+
+    suite = commands.add_parser("suite", help="synthetic corpora, as JSON")
+    suite.add_argument("--generator", default="all",
+                       choices=["all", *GENERATORS])
+    suite.add_argument("--pages", type=int, nargs="+", default=[1000, 10000])
+    suite.add_argument("--links", type=float, default=8)
+    suite.add_argument("--format", default="memory", choices=("memory", "html"),
+                       help="rank corpus dictionaries, or crawl the corpora "
+                            "written as HTML files first")
+    suite.add_argument("--samples", type=int, default=1000000)
+    suite.add_argument("--python-samples", type=int, default=10000,
+                       help="samples taken by the original sampler")
+    suite.add_argument("--no-memory", dest="memory", action="store_false",
+                       help="skip the second, traced run of each engine")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", metavar="FILE",
+                       help="write the JSON results to FILE, not stdout")
+    suite.set_defaults(run=benchmark_suite)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Concurrent, streaming crawler building a LinkGraph.
+
+Page names are known from the directory listing before any file is read,
+so each file's links are filtered to the corpus as soon as it is scanned,
+and the graph's CSR arrays grow one page at a time in page order. Files
+are read in fixed-size chunks, so no whole file, and no corpus
+dictionary of sets, is ever held in memory. With several workers, each
+thread of a pool scans a contiguous batch of pages, so that the pool
+costs a few tasks rather than one per file.
+
+After a change to the directory, `update_graph` rescans only the pages
+that were added, modified or removed.
+"""
+
+import os
+import re
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from sparse import LinkGraph, resolve
+
+# Same link pattern as `pagerank.crawl`, matched on the undecoded bytes
+# of a file so that only the links are decoded
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes at the end of a chunk that may be the start of a link the next
+# chunk completes: any prefix of a LINK match
+PARTIAL_LINK = re.compile(rb"<(?:a(?:\s+(?:[^>]*?href=\"[^\"]*|[^>]*))?)?\Z")
+
+# Bytes read from a file at a time
+CHUNK_SIZE = 1 << 16
+
+# Batches of pages scanned per worker thread
+BATCHES_PER_WORKER = 4
+
+
+def crawl_graph(directory, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Parses a directory of HTML pages into a LinkGraph of the links between
+    them, like `pagerank.crawl` but without building a dictionary.
+
+    Pages are scanned on `workers` threads (by default one per CPU), or
+    on the calling thread if that is 1.
+    """
+    pages = list_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    prefix = os.path.join(directory, "")
+
+    def scan(page):
+        links = scan_links(prefix + page, chunk_size)
+        links.discard(page)
+        return resolve(links, index)
+
+    indptr = array("q", [0])
+    indices = array("i")
+    unresolved = {}
+    for page, (links, outside) in zip(pages, map_pages(scan, pages,
+                                                       workers)):
+        indices.extend(links)
+        indptr.append(len(indices))
+        if outside:
+            unresolved[page] = outside
+    return LinkGraph(pages, indptr, indices, unresolved)
+
+
+def update_graph(directory, graph, pages, workers=None,
+                 chunk_size=CHUNK_SIZE):
+    """
+    Returns `graph` updated for changes to `pages` of the directory: those
+    still in it are rescanned, and the others removed.
+    """
+    present = set(list_pages(directory))
+    changed = sorted(page for page in pages if page in present)
+
+    def scan(page):
+        return scan_links(os.path.join(directory, page), chunk_size)
+
+    links = dict(zip(changed, map_pages(scan, changed, workers)))
+    return graph.update(links, set(pages) - present)
+
+
+def map_pages(scan, pages, workers=None):
+    """
+    Returns an iterator over `scan(page)` for each page in order, calling
+    it on contiguous batches of pages in a pool of `workers` threads (by
+    default one per CPU), or directly if that is 1.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pages) < 2:
+        return map(scan, pages)
+
+    def scan_batch(batch):
+        return [scan(page) for page in batch]
+
+    size = -(-len(pages) // (workers * BATCHES_PER_WORKER))
+    batches = [pages[i:i + size] for i in range(0, len(pages), size)]
+    with ThreadPoolExecutor(workers) as pool:
+        return chain.from_iterable(list(pool.map(scan_batch, batches)))
+
+
+def changed_pages(directory, graph, since):
+    """
+    Returns the set of pages added to or removed from the directory since
+    `graph` was crawled, and of those modified after the time `since`,
+    in nanoseconds since the epoch.
+    """
+    present = set(list_pages(directory))
+    changed = present.symmetric_difference(graph.index)
+    for page in present & graph.index.keys():
+        if os.stat(os.path.join(directory, page)).st_mtime_ns > since:
+            changed.add(page)
+    return changed
+
+
+def list_pages(directory):
+    """
+    Returns the sorted names of the HTML pages of a directory.
+    """
+    return sorted(filename for filename in os.listdir(directory)
+                  if filename.endswith(".html"))
+
+
+def scan_links(filename, chunk_size=CHUNK_SIZE):
+    """
+    Returns the set of link targets in a UTF-8 file, reading it in
+    chunks.
+
+    The bytes from the first link after the last one found that the
+    next chunk may still complete are carried over to it, so links split
+    across chunks are still found.
+    """
+    links = set()
+    carry = b""
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text = carry + chunk
+            # A short read is the end of the file
+            if len(chunk) < chunk_size:
+                links.update(LINK.findall(text))
+                return {link.decode("utf-8") for link in links}
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            partial = PARTIAL_LINK.search(text, end)
+            carry = text[partial.start():] if partial else b""
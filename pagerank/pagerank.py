@@ -1,24 +1,237 @@
+import argparse
+import heapq
+import json
 import os
 import random
 import re
 import sys
+import time
+import warnings
+from functools import partial
+from operator import itemgetter
+
+import numpy as np
+import scipy.sparse
+import scipy.stats
+
+import crawler
+import sampling
+import sparse
 
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
+    parser = argparse.ArgumentParser(
+        usage=("python pagerank.py [--sparse] [--sampler SAMPLER] "
+               "[--samples N] [--surfers N] [--tolerance T] [--workers N] "
+               "[--graph FILE [--update]] [--iteration-tolerance T] "
+               "[--norm NORM] [--max-iterations N] [--method METHOD] "
+               "[--residuals] [--top K] [--diff] [--json] corpus")
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--sparse", action="store_true",
+                        help="iterate with the sparse-matrix engine")
+    parser.add_argument("--sampler", default="python",
+                        choices=("python", "tables", "vectorized", "parallel"),
+                        help="sample with transition_model, with precomputed "
+                             "link tables, with many surfers in NumPy, or "
+                             "with batches of them in worker processes")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--surfers", type=int, default=1000,
+                        help="surfers simulated at once by --sampler "
+                             "vectorized and parallel; each first takes "
+                             f"{sampling.burn_in_steps(DAMPING)} uncounted "
+                             "steps, so at most --samples divided by that "
+                             "many surfers are simulated")
+    parser.add_argument("--tolerance", type=float, default=0.001,
+                        help="standard error per page at which --sampler "
+                             "parallel stops, before --samples are taken")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --sampler parallel")
+    parser.add_argument("--graph", metavar="FILE",
+                        help="load the crawled link graph from FILE, or "
+                             "crawl and save it there if FILE is missing")
+    parser.add_argument("--update", action="store_true",
+                        help="rescan the pages changed since --graph was "
+                             "saved, and with --sparse, iterate from the "
+                             "ranks saved with it")
+    parser.add_argument("--iteration-tolerance", type=float, default=0.001,
+                        help="residual at which iteration stops")
+    parser.add_argument("--norm", default="linf", choices=sorted(sparse.NORMS),
+                        help="norm of the change in ranks over a sweep "
+                             "compared with --iteration-tolerance")
+    parser.add_argument("--max-iterations", type=int, default=None,
+                        help="sweeps after which iteration stops even if "
+                             "it has not converged")
+    parser.add_argument("--method", default="power",
+                        choices=("power", "gauss-seidel", "aitken"),
+                        help="iterate with power iteration, Gauss-Seidel "
+                             "sweeps (fewer sweeps than power iteration, "
+                             "but each costs more, so usually more time) "
+                             "or Aitken extrapolation (with --sparse)")
+    parser.add_argument("--residuals", action="store_true",
+                        help="print the residual of every sweep")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="only print the K highest-ranked pages")
+    parser.add_argument("--diff", action="store_true",
+                        help="compare the sampled ranks with the iterated "
+                             "ones")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON, and progress to "
+                             "stderr")
+    args = parser.parse_args()
+    if args.update and not args.graph:
+        parser.error("--update requires --graph")
+    if args.method != "power" and not args.sparse:
+        parser.error("--method requires --sparse")
+
+    info = partial(print, file=sys.stderr) if args.json else print
+    output = {}
+
+    # Crawl concurrently into a link graph; the corpus dictionary is only
+    # built for the engines that need it
+    started = time.time_ns()
+    previous = None
+    save = bool(args.graph)
+    if args.graph and os.path.exists(args.graph):
+        graph = sparse.LinkGraph.load(args.graph)
+        save = args.update
+        if args.update:
+            since = os.stat(args.graph).st_mtime_ns
+            changed = crawler.changed_pages(args.corpus, graph, since)
+            previous = graph, sparse.load_ranks(args.graph)
+            graph = crawler.update_graph(args.corpus, graph, changed)
+            info(f"Updated {len(changed)} changed pages")
+    else:
+        graph = crawler.crawl_graph(args.corpus)
+    corpus = None
+    if args.sampler == "python" or not args.sparse:
+        corpus = graph.to_corpus()
+
+    if args.sampler == "python":
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+    elif args.sampler == "tables":
+        ranks = sampling.sample_graph(graph, DAMPING, args.samples)
+    elif args.sampler == "vectorized":
+        ranks = sampling.sample_graph(graph, DAMPING, args.samples,
+                                      surfers=args.surfers)
+    else:
+        result = sampling.parallel_sample(
+            graph, DAMPING,
+            tolerance=args.tolerance,
+            batch=min(args.samples, 100000),
+            max_samples=args.samples,
+            surfers=args.surfers,
+            workers=args.workers
+        )
+        ranks = result["ranks"]
+        args.samples = result["samples"]
+        info(f"Sampled {result['samples']} pages in "
+              f"{result['seconds']:.2f}s "
+              f"({result['samples_per_second']:.0f} samples/sec), "
+              f"standard error {result['standard_error']:.5f}"
+              + ("" if result["converged"] else " (not converged)"))
+    sampled = ranks
+    output["sampling"] = {"samples": args.samples}
+    if not args.json:
+        print(f"PageRank Results from Sampling (n = {args.samples})")
+    report_ranks(ranks, args.top, output["sampling"], not args.json)
+    residuals = []
+
+    def report(iteration, residual):
+        residuals.append(residual)
+        if args.residuals:
+            info(f"  sweep {iteration}: residual {residual:.3e}")
+
+    convergence = dict(tolerance=args.iteration_tolerance, norm=args.norm,
+                       max_iterations=args.max_iterations, report=report)
+    vector = None
+    if args.sparse:
+        start = None
+        if previous and previous[1] is not None:
+            start = sparse.carry_ranks(*previous, graph)
+        vector = sparse.solve(graph, DAMPING, method=args.method,
+                              ranks=start, **convergence)["ranks"]
+        ranks = graph.ranks_dict(vector)
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING, **convergence)
+    converged = (bool(residuals)
+                 and residuals[-1] < args.iteration_tolerance)
+    if args.residuals:
+        info(f"{'Converged' if converged else 'Stopped'} after "
+             f"{len(residuals)} sweeps")
+    if save:
+        # Dated to the start of the crawl, so that --update also rescans
+        # pages changed while it ran
+        graph.save(args.graph, vector)
+        os.utime(args.graph, ns=(started, started))
+    output["iteration"] = {"sweeps": len(residuals), "converged": converged}
+    if not args.json:
+        print(f"PageRank Results from Iteration")
+    report_ranks(ranks, args.top, output["iteration"], not args.json)
+
+    if args.diff:
+        output["diff"] = compare_ranks(sampled, ranks)
+        if not args.json:
+            print("Sampling compared with Iteration")
+            for name, value in output["diff"].items():
+                value = "undefined" if value is None else f"{value:.4f}"
+                print(f"  {name.replace('_', ' ')}: {value}")
+    if args.json:
+        json.dump(output, sys.stdout, indent=2, allow_nan=False)
+        print()
+
+
+def report_ranks(ranks, top, output, echo=True):
+    """
+    Adds the ranks of every page in page order, or of the `top` pages
+    from the highest rank down, to the JSON `output`, and prints them if
+    `echo`.
+    """
+    if top is None:
+        listing = sorted(ranks.items())
+        output["ranks"] = dict(listing)
+    else:
+        listing = top_pages(ranks, top)
+        output["top"] = [{"page": page, "rank": rank}
+                         for page, rank in listing]
+    if echo:
+        for page, rank in listing:
+            print(f"  {page}: {rank:.4f}")
+
+
+def top_pages(ranks, k):
+    """
+    Return the `k` (page, rank) pairs with the highest ranks, highest
+    first, selected with a heap of size `k` rather than a full sort.
+    """
+    return heapq.nlargest(k, ranks.items(), key=itemgetter(1))
+
+
+def compare_ranks(estimated, exact):
+    """
+    Return the maximum and mean absolute differences between two
+    dictionaries of PageRank values, and the Spearman and Kendall
+    correlations between the orders they rank the pages in. A
+    correlation is None where it is undefined, as when all pages have
+    the same rank in either dictionary.
+    """
+    pages = list(exact)
+    x = np.array([estimated[page] for page in pages])
+    y = np.array([exact[page] for page in pages])
+    error = np.abs(x - y)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", scipy.stats.ConstantInputWarning)
+        spearman = scipy.stats.spearmanr(x, y).statistic
+        kendall = scipy.stats.kendalltau(x, y).statistic
+    return {
+        "max_absolute_error": float(error.max()),
+        "mean_absolute_error": float(error.mean()),
+        "spearman": float(spearman) if np.isfinite(spearman) else None,
+        "kendall": float(kendall) if np.isfinite(kendall) else None
+    }
 
 
 def crawl(directory):
@@ -100,38 +313,74 @@ def sample_pagerank(corpus, damping_factor, n):
     return {pg: prb/n for pg, prb in pages_counter.items()}
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, norm="linf",
+                     max_iterations=None, report=None):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until convergence: until the `norm` ("l1" or "linf")
+    of the change in ranks over a sweep is below `tolerance`, or for at
+    most `max_iterations` sweeps. `report`, if given, is called with the
+    number and residual of every sweep.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # raise NotImplementedError
-    len_corpus = len(corpus)
-    rank = 1/len_corpus
-    p_ranks = {p: rank for p in corpus}
-
-    for p in corpus:
-        if not corpus[p]:
-            corpus[p] = set(corpus.keys())
+    # The corpus is interned rather than changed: each page's rank is
+    # shared along its links, read from the arrays of a LinkGraph, and
+    # the rank of pages without links is spread over all pages as one term
+    graph = sparse.LinkGraph.from_corpus(corpus)
+    len_corpus = len(graph)
+    degree = np.maximum(graph.out_degree, 1)
+    p_ranks = np.full(len_corpus, 1 / len_corpus)
 
-    while True:
-        new_pr = dict()
-        for page in corpus:
-            pr_page = (((1-damping_factor) / len_corpus) +
-                       (damping_factor *
-                        sum([p_ranks[i] / len(corpus[i]) for i in corpus if page in corpus[i]])))
-
-            new_pr[page] = pr_page
+    measure = sparse.NORMS[norm]
+    iteration = 0
+    while max_iterations is None or iteration < max_iterations:
+        iteration += 1
+        dangling_rank = p_ranks[graph.dangling].sum()
+        base = ((1 - damping_factor) / len_corpus
+                + damping_factor * dangling_rank / len_corpus)
+        share = damping_factor * p_ranks / degree
+        new_pr = base + np.bincount(
+            graph.indices, weights=np.repeat(share, graph.out_degree),
+            minlength=len_corpus
+        )
 
-        if all([abs((p_ranks[p] - new_pr[p])) < 0.001 for p in corpus]):
+        residual = float(measure(p_ranks - new_pr))
+        if report is not None:
+            report(iteration, residual)
+        if residual < tolerance:
             break
 
         p_ranks = new_pr
-    return p_ranks
+    return graph.ranks_dict(p_ranks)
+
+
+def personalized_pagerank(corpus, damping_factor, personalizations,
+                          tolerance=0.001, norm="linf", max_iterations=None):
+    """
+    Return PageRank values personalized to each of `personalizations`,
+    dictionaries mapping pages to the weight with which a surfer
+    teleports to them (pages not mentioned get no weight), solving all
+    of them together.
+
+    Return a list with a dictionary of PageRank values per
+    personalization, in order.
+    """
+    graph = sparse.LinkGraph.from_corpus(corpus)
+    rows, columns, values = [], [], []
+    for column, weights in enumerate(personalizations):
+        for page, weight in weights.items():
+            rows.append(graph.index[page])
+            columns.append(column)
+            values.append(weight)
+    teleport = scipy.sparse.coo_matrix(
+        (values, (rows, columns)), shape=(len(graph), len(personalizations))
+    )
+    ranks = sparse.personalized_iteration(graph, damping_factor, teleport,
+                                          tolerance, norm, max_iterations)
+    return [graph.ranks_dict(column) for column in ranks.T]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+"""
+Fast random-surfer sampling of PageRank.
+
+`transition_model` is a mixture of two uniform distributions: with
+probability `damping_factor` a link of the current page, otherwise any
+page in the corpus (always any page, for a page without links). Drawing
+the next page therefore needs no per-step distribution: the link arrays
+of a LinkGraph are the precomputed tables, and each step is one or two
+O(1) draws.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from sparse import LinkGraph
+
+# Positions recorded between two bincounts in vectorized sampling
+BUFFER_SIZE = 1 << 22
+
+# Largest difference, in total variation, between the distribution of a
+# vectorized surfer's first counted page and the PageRank distribution
+BURN_IN_BIAS = 1e-4
+
+# Sampler of the graph being sampled, in each worker process
+_worker_sampler = None
+
+
+class Sampler():
+    """
+    Random surfers over a LinkGraph.
+    """
+
+    def __init__(self, graph, damping_factor, seed=None):
+        self.graph = graph
+        self.damping_factor = damping_factor
+        self.seed = seed
+
+    def walk(self, n):
+        """
+        Returns the visit counts of one surfer taking `n` steps from a
+        page chosen at random, drawing one step at a time.
+        """
+        rng = random.Random(self.seed)
+        indptr = self.graph.indptr.tolist()
+        indices = self.graph.indices.tolist()
+        links = [indices[start:end]
+                 for start, end in zip(indptr[:-1], indptr[1:])]
+        pages = len(links)
+        damping_factor = self.damping_factor
+        counts = [0] * pages
+        page = rng.randrange(pages)
+        for _ in range(n):
+            counts[page] += 1
+            page_links = links[page]
+            if page_links and rng.random() < damping_factor:
+                page = page_links[rng.randrange(len(page_links))]
+            else:
+                page = rng.randrange(pages)
+        return np.array(counts)
+
+    def surf(self, n, surfers=1000, bias=BURN_IN_BIAS):
+        """
+        Returns the visit counts of `surfers` independent surfers, each
+        starting from a page chosen at random, taking about `n` steps in
+        total. All surfers step at once with vectorized draws.
+
+        Each surfer first takes `burn_in_steps(damping_factor, bias)`
+        uncounted steps, so that the uniform start does not bias the
+        counts. To keep that cost below the `n` counted steps, at most
+        `n` // burn-in steps surfers are simulated.
+        """
+        graph = self.graph
+        rng = np.random.default_rng(self.seed)
+        pages = len(graph)
+        burn_in = burn_in_steps(self.damping_factor, bias)
+        surfers = max(1, min(surfers, n // max(burn_in, 1)))
+        steps = -(-n // surfers)
+        counts = np.zeros(pages, dtype=np.int64)
+        buffer = np.empty(max(BUFFER_SIZE // surfers, 1) * surfers,
+                          dtype=np.int32)
+        filled = 0
+
+        position = rng.integers(0, pages, surfers)
+        for step in range(-burn_in, steps):
+            if step >= 0:
+                buffer[filled:filled + surfers] = position
+                filled += surfers
+                if filled == len(buffer):
+                    counts += np.bincount(buffer, minlength=pages)
+                    filled = 0
+
+            degree = graph.out_degree[position]
+            follow = (rng.random(surfers) < self.damping_factor) & (degree > 0)
+            following = position[follow]
+            offset = (rng.random(len(following)) * degree[follow]).astype(
+                np.int64
+            )
+            position = rng.integers(0, pages, surfers)
+            position[follow] = graph.indices[graph.indptr[following] + offset]
+
+        counts += np.bincount(buffer[:filled], minlength=pages)
+        return counts
+
+
+def burn_in_steps(damping_factor, bias=BURN_IN_BIAS):
+    """
+    Returns the number of steps after which a surfer started from any
+    page is within `bias` of the PageRank distribution, in total
+    variation.
+
+    Two surfers meet once both jump to the same random page, which each
+    step does with probability at least 1 - `damping_factor`, so the
+    difference shrinks by that factor every step.
+    """
+    if damping_factor <= 0:
+        return 0
+    if damping_factor >= 1:
+        raise ValueError("damping factor must be below 1 to sample")
+    return max(0, math.ceil(math.log(bias) / math.log(damping_factor)))
+
+
+def sample_pagerank(corpus, damping_factor, n, surfers=None, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages, like
+    `pagerank.sample_pagerank`, from precomputed link tables.
+
+    If `surfers` is given, that many surfers are simulated at once with
+    NumPy instead of a single surfer in Python.
+    """
+    return sample_graph(LinkGraph.from_corpus(corpus), damping_factor, n,
+                        surfers, seed)
+
+
+def sample_graph(graph, damping_factor, n, surfers=None, seed=None):
+    """
+    Return PageRank values for each page of a LinkGraph by sampling `n`
+    pages, like `sample_pagerank`.
+    """
+    sampler = Sampler(graph, damping_factor, seed)
+    if surfers is None:
+        counts = sampler.walk(n)
+    else:
+        counts = sampler.surf(n, surfers)
+    return graph.ranks_dict(counts / counts.sum())
+
+
+def parallel_sample(graph, damping_factor, tolerance=0.001, batch=100000,
+                    max_samples=100000000, surfers=1000, workers=None,
+                    seed=None):
+    """
+    Estimates PageRank with independent batches of vectorized surfers run
+    in a pool of worker processes, each batch seeded from its own child
+    of one SeedSequence.
+
+    Each batch's visit frequencies are an independent estimate of the
+    ranks, so after every round of one batch per worker, the standard
+    error of each page's mean is estimated from the spread of the batch
+    estimates. Sampling stops once the largest standard error is below
+    `tolerance`, or after `max_samples` samples.
+
+    The spread of the batches does not show the bias of surfers that
+    have not yet forgotten their random starting pages, so every batch
+    burns its surfers in until that bias is below `tolerance` (and
+    below BURN_IN_BIAS) before counting; only then does a small standard
+    error mean that the ranks have converged.
+
+    Returns a dictionary with the "ranks" of each page, the number of
+    "samples" taken, the "seconds" and "samples_per_second", the
+    "standard_error" reached, the "burn_in" steps each surfer took
+    first, and whether sampling "converged".
+    """
+    workers = workers or os.cpu_count()
+    bias = min(tolerance, BURN_IN_BIAS)
+    seeds = np.random.SeedSequence(seed)
+    context = multiprocessing.get_context("fork")
+    start = time.perf_counter()
+    estimates = []
+    counts = np.zeros(len(graph), dtype=np.int64)
+    standard_error = float("inf")
+    with context.Pool(workers, initializer=_start_worker,
+                      initargs=(graph, damping_factor)) as pool:
+        while counts.sum() < max_samples:
+            remaining = max_samples - counts.sum()
+            size = min(batch, -(-remaining // workers))
+            tasks = [(child, size, surfers, bias)
+                     for child in seeds.spawn(workers)]
+            for batch_counts in pool.starmap(_sample_batch, tasks):
+                counts += batch_counts
+                estimates.append(batch_counts / batch_counts.sum())
+            if len(estimates) > 1:
+                standard_error = float(
+                    np.std(estimates, axis=0, ddof=1).max()
+                    / np.sqrt(len(estimates))
+                )
+                if standard_error < tolerance:
+                    break
+    seconds = time.perf_counter() - start
+    samples = int(counts.sum())
+    return {
+        "ranks": graph.ranks_dict(counts / samples),
+        "samples": samples,
+        "seconds": seconds,
+        "samples_per_second": samples / seconds,
+        "standard_error": standard_error,
+        "burn_in": burn_in_steps(damping_factor, bias),
+        "converged": standard_error < tolerance
+    }
+
+
+def _start_worker(graph, damping_factor):
+    """
+    Keeps a Sampler of the graph for the batches run by a worker.
+    """
+    global _worker_sampler
+    _worker_sampler = Sampler(graph, damping_factor)
+
+
+def _sample_batch(seed, n, surfers, bias):
+    """
+    Returns the visit counts of a batch of `n` samples in a worker, taken
+    after a burn-in to within `bias`.
+    """
+    _worker_sampler.seed = seed
+    return _worker_sampler.surf(n, surfers, bias)
@@ -0,0 +1,493 @@
+"""
+Sparse-matrix PageRank engine.
+
+The corpus is interned once into a LinkGraph, a CSR adjacency of page
+numbers, and PageRank is computed by power iteration with one sparse
+matrix-vector product per sweep. Pages without links are not expanded
+into links to every page: their rank is pooled and spread evenly, which
+gives the same ranks as `iterate_pagerank` in O(pages + links) memory.
+
+`solve` stops on the L1 or L-infinity norm of the change in a sweep, and
+can replace plain power iteration with Gauss-Seidel sweeps or with
+periodic Aitken extrapolation. `personalized_iteration` solves a batch of
+personalized PageRank vectors at once.
+"""
+
+from functools import cached_property
+from itertools import compress
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+# Largest change of any page's rank in a sweep at which iteration stops,
+# as in `pagerank.iterate_pagerank`
+TOLERANCE = 0.001
+
+# Norms of the change in ranks over a sweep, of each column for a matrix
+# of rank vectors
+NORMS = {
+    "l1": lambda change: np.abs(change).sum(axis=0),
+    "linf": lambda change: np.abs(change).max(axis=0)
+}
+
+# Sweeps between two Aitken extrapolations
+AITKEN_PERIOD = 10
+
+
+class LinkGraph():
+    """
+    Link graph of a corpus with pages interned to the integers
+    0..n-1, in the order of `pages`.
+
+    The pages linked to by page `i` are `indices[indptr[i]:indptr[i + 1]]`.
+    Links to pages outside the corpus are kept by name in `unresolved`, a
+    dictionary from page name to a set of names, so that they can become
+    links when those pages are added by `update`.
+    """
+
+    def __init__(self, pages, indptr, indices, unresolved=None):
+        self.pages = list(pages)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.out_degree = np.diff(self.indptr)
+        self.dangling = self.out_degree == 0
+        self.unresolved = unresolved or {}
+        self._matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Interns a corpus dictionary mapping each page to the set of pages
+        it links to. Links to pages outside the corpus are unresolved.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        indices = []
+        unresolved = {}
+        for i, page in enumerate(pages):
+            links, outside = resolve(corpus[page], index)
+            indices.extend(links)
+            indptr[i + 1] = len(indices)
+            if outside:
+                unresolved[page] = outside
+        return cls(pages, indptr, indices, unresolved)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a graph saved by `save`.
+        """
+        with np.load(filename) as data:
+            pages = _lines(data["pages"])
+            unresolved = {}
+            if "unresolved" in data.files:
+                for line in _lines(data["unresolved"]):
+                    page, *links = line.split("\t")
+                    unresolved[page] = set(links)
+            return cls(pages, data["indptr"], data["indices"], unresolved)
+
+    def save(self, filename, ranks=None):
+        """
+        Saves the graph as a compressed .npz file of its CSR arrays, its
+        newline-separated page names and its unresolved links, with the
+        rank vector `ranks` if given.
+        """
+        arrays = {
+            "pages": _blob(self.pages),
+            "unresolved": _blob("\t".join([page, *sorted(links)])
+                                for page, links in self.unresolved.items()),
+            "indptr": self.indptr,
+            "indices": self.indices
+        }
+        if ranks is not None:
+            arrays["ranks"] = ranks
+        with open(filename, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    def to_corpus(self):
+        """
+        Returns the graph as a corpus dictionary mapping each page to the
+        set of pages it links to.
+        """
+        return {
+            page: {self.pages[j]
+                   for j in self.indices[self.indptr[i]:self.indptr[i + 1]]}
+            for i, page in enumerate(self.pages)
+        }
+
+    @cached_property
+    def index(self):
+        """
+        Dictionary from page name to page number.
+        """
+        return {page: i for i, page in enumerate(self.pages)}
+
+    def __len__(self):
+        return len(self.pages)
+
+    def matrix(self):
+        """
+        Returns the sparse matrix whose entry (j, i) is 1 / out-degree(i)
+        for every link from page i to page j, so that multiplying it by
+        a rank vector spreads each linking page's rank over its links.
+        """
+        if self._matrix is None:
+            n = len(self.pages)
+            weights = np.repeat(
+                1 / np.maximum(self.out_degree, 1), self.out_degree
+            )
+            self._matrix = scipy.sparse.csr_matrix(
+                (weights, self.indices, self.indptr), shape=(n, n)
+            ).T.tocsr()
+        return self._matrix
+
+    def update(self, links, removed=()):
+        """
+        Returns a new graph with the pages of `removed` deleted, and the
+        pages of `links`, a dictionary mapping each added or modified page
+        to the set of names it links to, replaced.
+
+        Kept pages stay in order and added pages follow them, so the rows
+        of unchanged pages are renumbered with array operations only.
+        Their links to removed pages become unresolved, and their
+        unresolved links to added pages become links.
+        """
+        removed = {page for page in removed
+                   if page in self.index and page not in links}
+        added = sorted(page for page in links if page not in self.index)
+        n = len(self.pages)
+
+        keep = np.ones(n, dtype=bool)
+        keep[[self.index[page] for page in removed]] = False
+        renumber = np.cumsum(keep) - 1
+        renumber[~keep] = -1
+        pages = list(compress(self.pages, keep))
+        pages.extend(added)
+
+        # New numbers of the pages named by changes and unresolved links
+        named = set(links).union(self.unresolved, *links.values())
+        index = {page: int(renumber[self.index[page]]) for page in named
+                 if page in self.index and page not in removed}
+        index.update((page, i) for i, page in enumerate(added, int(keep.sum())))
+
+        # Rows of unchanged pages, without links to removed pages
+        unchanged = keep.copy()
+        unchanged[[self.index[page] for page in links
+                   if page in self.index]] = False
+        rows = np.repeat(np.arange(n), self.out_degree)
+        targets = renumber[self.indices]
+        kept_edges = unchanged[rows]
+        lost = kept_edges & (targets < 0)
+        kept_edges &= targets >= 0
+
+        unresolved = {page: set(names)
+                      for page, names in self.unresolved.items()
+                      if page not in removed and page not in links}
+        for row, target in zip(rows[lost].tolist(),
+                               self.indices[lost].tolist()):
+            unresolved.setdefault(self.pages[row], set()).add(
+                self.pages[target]
+            )
+
+        # Rows of changed pages, and links of unchanged pages to added
+        # pages, which come after all of their kept links
+        sources, extra = [], []
+        for page, names in links.items():
+            resolved, outside = resolve(names - {page}, index)
+            sources.extend([index[page]] * len(resolved))
+            extra.extend(resolved)
+            unresolved.pop(page, None)
+            if outside:
+                unresolved[page] = outside
+        if added:
+            new = set(added)
+            for page, names in list(unresolved.items()):
+                if page in links:
+                    continue
+                found = names & new
+                if found:
+                    sources.extend([index[page]] * len(found))
+                    extra.extend(sorted(index[name] for name in found))
+                    names -= found
+                    if not names:
+                        del unresolved[page]
+
+        sources = np.concatenate(
+            (renumber[rows[kept_edges]], np.asarray(sources, dtype=np.int64))
+        )
+        targets = np.concatenate(
+            (targets[kept_edges], np.asarray(extra, dtype=np.int64))
+        )
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(pages)), out=indptr[1:])
+        return LinkGraph(pages, indptr, targets[order], unresolved)
+
+    def ranks_dict(self, ranks):
+        """
+        Returns a rank vector as a dictionary from page name to rank.
+        """
+        return dict(zip(self.pages, ranks.tolist()))
+
+
+def resolve(names, index):
+    """
+    Splits a set of link names into the sorted numbers of the pages of
+    `index` among them, and the set of the other names.
+    """
+    outside = names.difference(index)
+    inside = names - outside if outside else names
+    return sorted([index[name] for name in inside]), outside
+
+
+def load_ranks(filename):
+    """
+    Returns the rank vector saved with a graph by `LinkGraph.save`, or
+    None if it was saved without one.
+    """
+    with np.load(filename) as data:
+        return data["ranks"] if "ranks" in data.files else None
+
+
+def carry_ranks(old_graph, ranks, graph):
+    """
+    Returns a starting rank vector for `graph` from the ranks of an older
+    version of it: kept pages keep their rank, added pages start at the
+    uniform rank, and the vector is rescaled to sum to 1.
+    """
+    n = len(graph)
+    start = np.full(n, 1 / n)
+    index = old_graph.index
+    old = np.array([index.get(page, -1) for page in graph.pages],
+                   dtype=np.int64)
+    kept = old >= 0
+    start[kept] = ranks[old[kept]]
+    return start / start.sum()
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE, ranks=None):
+    """
+    Returns the PageRank vector of a LinkGraph, iterating from `ranks`,
+    or from the uniform distribution, until no page's rank changes by
+    `tolerance` or more in a sweep.
+
+    Starting from the ranks of a similar graph, as from `carry_ranks`
+    after an update, needs only a few sweeps.
+    """
+    return solve(graph, damping_factor, tolerance, ranks=ranks)["ranks"]
+
+
+def solve(graph, damping_factor, tolerance=TOLERANCE, norm="linf",
+          max_iterations=None, method="power", ranks=None, report=None):
+    """
+    Iterates PageRank sweeps over a LinkGraph from `ranks`, or from the
+    uniform distribution, until the `norm` ("l1" or "linf") of the change
+    in a sweep is below `tolerance`, or for at most `max_iterations`
+    sweeps. `report`, if given, is called with the number and residual
+    of every sweep.
+
+    `method` is "power" for power iteration, "gauss-seidel" for sweeps
+    that use the ranks already updated in the same sweep, or "aitken"
+    for power iteration extrapolated every `AITKEN_PERIOD` sweeps.
+
+    Returns a dictionary with the "ranks", the number of "iterations",
+    the "residuals" of every sweep, and whether iteration "converged".
+    """
+    n = len(graph)
+    measure = NORMS[norm]
+    if method == "gauss-seidel":
+        sweep = gauss_seidel(graph, damping_factor)
+    elif method in ("power", "aitken"):
+        matrix = graph.matrix()
+
+        def sweep(ranks):
+            return step(matrix, graph.dangling, ranks, damping_factor)
+    else:
+        raise ValueError(f"unknown method {method!r}")
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+
+    residuals = []
+    older = unextrapolated = None
+    extrapolate = method == "aitken"
+    converged = False
+    while max_iterations is None or len(residuals) < max_iterations:
+        new_ranks = sweep(ranks)
+        residual = float(measure(new_ranks - ranks))
+        residuals.append(residual)
+        if report is not None:
+            report(len(residuals), residual)
+        if residual < tolerance:
+            ranks = new_ranks
+            converged = True
+            break
+        if unextrapolated is not None:
+            # An extrapolation that did not shrink the residual is undone,
+            # and not tried again
+            if residual > residuals[-2]:
+                ranks, extrapolate = unextrapolated, False
+                unextrapolated = None
+                continue
+            unextrapolated = None
+        if (extrapolate and len(residuals) % AITKEN_PERIOD == 0
+                and _steady(residuals)):
+            unextrapolated = new_ranks
+            new_ranks = aitken(older, ranks, new_ranks)
+        older, ranks = ranks, new_ranks
+    return {
+        "ranks": ranks,
+        "iterations": len(residuals),
+        "residuals": residuals,
+        "converged": converged
+    }
+
+
+def _steady(residuals):
+    """
+    Returns whether the last residuals shrink by a steady ratio, as they
+    do once one eigenvector dominates the error, when Aitken
+    extrapolation removes it. Otherwise extrapolation can slow
+    convergence down.
+    """
+    if len(residuals) < 3 or not residuals[-3] or not residuals[-2]:
+        return False
+    first = residuals[-2] / residuals[-3]
+    second = residuals[-1] / residuals[-2]
+    return abs(first - second) < 0.01 * second
+
+
+def personalized_iteration(graph, damping_factor, teleport,
+                           tolerance=TOLERANCE, norm="linf",
+                           max_iterations=None):
+    """
+    Returns the PageRank vectors of a LinkGraph personalized by each
+    column of `teleport`, a pages × k array or sparse matrix of teleport
+    weights, as the columns of a pages × k array.
+
+    A surfer teleports, and leaves a page without links, to a page drawn
+    from its column's weights rather than from all pages, so a column of
+    equal weights gives the ordinary ranks. All columns are iterated
+    together, with one sparse matrix × dense matrix product per sweep,
+    until the change of each column is below `tolerance` in `norm`.
+    """
+    teleport = scipy.sparse.csc_matrix(teleport, dtype=float)
+    weights = np.asarray(teleport.sum(axis=0)).ravel()
+    if not np.all(weights > 0):
+        raise ValueError("personalization without positive weight")
+    teleport = teleport.multiply(1 / weights).tocoo()
+    teleport.sum_duplicates()
+    rows, columns, values = teleport.row, teleport.col, teleport.data
+    matrix = damping_factor * graph.matrix()
+    measure = NORMS[norm]
+    dangling = np.flatnonzero(graph.dangling)
+    result = np.empty(teleport.shape)
+
+    # Columns that have converged are set aside, and the others iterated
+    active = np.arange(teleport.shape[1])
+    ranks = teleport.toarray()
+    iterations = 0
+    while len(active) and (max_iterations is None
+                           or iterations < max_iterations):
+        iterations += 1
+        # Teleporting and leaving pages without links both follow the
+        # teleport weights
+        scale = (damping_factor * ranks[dangling].sum(axis=0)
+                 + 1 - damping_factor)
+        new_ranks = matrix @ ranks
+        new_ranks[rows, columns] += values * scale[columns]
+        converged = measure(np.subtract(new_ranks, ranks, out=ranks)) < tolerance
+        ranks = new_ranks
+        if converged.any():
+            result[:, active[converged]] = ranks[:, converged]
+            active = active[~converged]
+            ranks = np.ascontiguousarray(ranks[:, ~converged])
+            renumber = np.cumsum(~converged) - 1
+            kept = ~converged[columns]
+            rows, values = rows[kept], values[kept]
+            columns = renumber[columns[kept]]
+    result[:, active] = ranks
+    return result
+
+
+def gauss_seidel(graph, damping_factor):
+    """
+    Returns a function computing one Gauss-Seidel sweep from a rank
+    vector, for the linear system of PageRank with the dangling pages'
+    rank taken from the previous sweep.
+
+    Each sweep solves the lower triangle of the system, so a page uses
+    the new ranks of the pages before it. The triangle is factored once,
+    in its own order, so that a sweep is one forward substitution in
+    SuperLU. That still costs two to three power iteration sweeps, on
+    top of the factoring, so Gauss-Seidel takes fewer sweeps than power
+    iteration but usually more time.
+    """
+    n = len(graph)
+    matrix = graph.matrix()
+    lower = (scipy.sparse.identity(n, format="csc")
+             - damping_factor * scipy.sparse.tril(matrix)).tocsc()
+    upper = (damping_factor * scipy.sparse.triu(matrix, k=1)).tocsr()
+    solve_lower = scipy.sparse.linalg.splu(
+        lower, permc_spec="NATURAL", diag_pivot_thresh=0,
+        options={"SymmetricMode": True}
+    ).solve
+
+    def sweep(ranks):
+        teleport = (damping_factor * ranks[graph.dangling].sum()
+                    + 1 - damping_factor) / n
+        new_ranks = solve_lower(upper @ ranks + teleport)
+        return new_ranks / new_ranks.sum()
+    return sweep
+
+
+def aitken(first, second, third):
+    """
+    Returns the Aitken extrapolation of three successive rank vectors,
+    page by page, keeping the last rank where the differences vanish or
+    the extrapolated rank is not positive.
+    """
+    change = third - second
+    curvature = change - (second - first)
+    extrapolated = third.copy()
+    usable = np.abs(curvature) > 1e-15
+    extrapolated[usable] -= change[usable] ** 2 / curvature[usable]
+    extrapolated = np.where(extrapolated > 0, extrapolated, third)
+    return extrapolated / extrapolated.sum()
+
+
+def step(matrix, dangling, ranks, damping_factor):
+    """
+    Returns the rank vector after one PageRank sweep from `ranks`.
+
+    The rank of dangling pages is spread evenly over all pages.
+    """
+    n = matrix.shape[0]
+    dangling_rank = ranks[dangling].sum()
+    return (damping_factor * (matrix @ ranks + dangling_rank / n)
+            + (1 - damping_factor) / n)
+
+
+def _blob(lines):
+    """
+    Returns newline-separated lines as a byte array for an .npz file.
+    """
+    return np.frombuffer("\n".join(lines).encode("utf-8"), dtype=np.uint8)
+
+
+def _lines(blob):
+    """
+    Returns the lines of a byte array written by `_blob`.
+    """
+    text = bytes(blob).decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def iterate_pagerank(corpus, damping_factor):
+    """
+    Return PageRank values for each page by sparse power iteration,
+    like `pagerank.iterate_pagerank`.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.ranks_dict(power_iteration(graph, damping_factor))
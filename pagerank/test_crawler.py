@@ -0,0 +1,40 @@
+import os
+import re
+import tempfile
+import unittest
+
+import crawler
+
+PAGE = """<html><body>
+<p>1 < 2, and <b>bold</b></p>
+<a title="a<b" href="1.html">one</a>
+<a class="x"
+   href="2.html">two</a>
+<abbr title="not a link">abbr</abbr>
+<a href="3.html" title="b>c">three</a> <a title="<a" href="4.html">four</a>
+<a   href="5.html">five</a><a href="6.html">six</a>
+</body></html>
+"""
+
+
+class ScanLinksTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "page.html")
+        with open(self.filename, "w") as f:
+            f.write(PAGE)
+
+    def test_chunked_scans_match_whole_file(self):
+        expected = set(re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", PAGE))
+        self.assertEqual(expected, {f"{i}.html" for i in range(1, 7)})
+        for chunk_size in range(1, len(PAGE) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    crawler.scan_links(self.filename, chunk_size), expected
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+Benchmarks for the Tic Tac Toe AI.
+
+Usage: python benchmark.py search [--repeat N]
+       python benchmark.py throughput
+       python benchmark.py deepening [--game M N K] [--budgets S ...]
+       python benchmark.py book [--repeat N]
+"""
+
+import argparse
+import time
+
+import bitboard
+import mnk
+import tictactoe as ttt
+
+
+def count_nodes():
+    """
+    Wraps `tictactoe.terminal`, called once for every board searched, so
+    that searched boards are counted. Returns a function that reads and
+    resets the counter.
+    """
+    terminal = ttt.terminal
+    counter = [0]
+
+    def counting(board):
+        counter[0] += 1
+        return terminal(board)
+
+    def read():
+        count, counter[0] = counter[0], 0
+        return count
+
+    ttt.terminal = counting
+    return read
+
+
+def plain_minimax(board):
+    """
+    Returns the optimal action by minimax without pruning or memoization,
+    as the AI searched before.
+    """
+    best = None
+    for action in ttt.actions(board):
+        value = plain_value(ttt.result(board, action))
+        if (best is None or (ttt.player(board) == ttt.X and value > best[0])
+                or (ttt.player(board) == ttt.O and value < best[0])):
+            best = value, action
+    return best[1]
+
+
+def plain_value(board, engine=ttt):
+    """
+    Returns the value of the board by searching all of its games, with
+    the functions of an engine module.
+    """
+    if engine.terminal(board):
+        return engine.utility(board)
+    values = [plain_value(engine.result(board, action), engine)
+              for action in engine.actions(board)]
+    return max(values) if engine.player(board) == ttt.X else min(values)
+
+
+def plain_bitboard_value(x, o, maximizing):
+    """
+    Returns the value of a bitboard position by searching all of its
+    games, on the masks directly.
+    """
+    if bitboard.WINNING[x]:
+        return 1
+    if bitboard.WINNING[o]:
+        return -1
+    occupied = x | o
+    if occupied == bitboard.FULL:
+        return 0
+    if maximizing:
+        return max(plain_bitboard_value(x | bit, o, False)
+                   for bit in bitboard.ORDER if not occupied & bit)
+    return min(plain_bitboard_value(x, o | bit, True)
+               for bit in bitboard.ORDER if not occupied & bit)
+
+
+def timed(function, *args):
+    """
+    Returns the result of calling a function, and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_search(args):
+    """
+    Counts the boards searched and times the first move from the empty
+    board, by plain minimax and by alpha-beta search with and without a
+    filled transposition table.
+    """
+    read = count_nodes()
+    board = ttt.initial_state()
+    ttt.book = None
+
+    _, seconds = timed(plain_minimax, board)
+    print(f"{'plain minimax':>28}: {read():>7} boards, "
+          f"{seconds * 1000:>8.1f} ms")
+
+    for _ in range(args.repeat):
+        ttt.transpositions.clear()
+        _, seconds = timed(ttt.minimax, board)
+    print(f"{'alpha-beta, empty table':>28}: {read() // args.repeat:>7} "
+          f"boards, {seconds * 1000:>8.1f} ms")
+
+    for _ in range(args.repeat):
+        _, seconds = timed(ttt.minimax, board)
+    print(f"{'alpha-beta, filled table':>28}: {read() // args.repeat:>7} "
+          f"boards, {seconds * 1000:>8.1f} ms")
+    print(f"{'':>28}  {len(ttt.transpositions)} positions in the table")
+
+
+def benchmark_throughput(args):
+    """
+    Times searching the whole game tree from the empty board without
+    pruning, on list boards and on bitboards through the same functions,
+    and on bitboard masks directly.
+    """
+    boards = 549946
+    searches = [
+        ("boards", plain_value, ttt.initial_state()),
+        ("bitboards", plain_value, bitboard.initial_state(), bitboard),
+        ("bitboard masks", plain_bitboard_value, 0, 0, True)
+    ]
+    for name, function, *arguments in searches:
+        value, seconds = timed(function, *arguments)
+        assert value == 0
+        print(f"{name:>14}: {seconds:>6.2f}s, "
+              f"{boards / seconds:>10.0f} positions/second")
+
+
+def benchmark_deepening(args):
+    """
+    Reports how deep iterative deepening searches the first move of an
+    m,n,k-game within each time budget.
+    """
+    rows, columns, k = args.game
+    for budget in args.budgets:
+        search = mnk.Search(ttt.initial_state(rows, columns), k,
+                            mnk.evaluate, time.perf_counter() + budget)
+        move, seconds = timed(search.run)
+        print(f"{rows}x{columns}, {k} in a row, {budget}s: move {move} "
+              f"at depth {search.depth}, {search.nodes} nodes "
+              f"in {seconds:.3f}s")
+
+
+def benchmark_book(args):
+    """
+    Times loading the opening book, and answering every reachable board
+    from it against searching with a filled transposition table.
+    """
+    if ttt.load_book() is None:
+        print(f"No opening book at {ttt.BOOK_FILE}; run book.py first")
+        return
+    _, load_time = timed(ttt.load_book)
+    boards, seen = [ttt.initial_state()], set()
+    positions = []
+    while boards:
+        board = boards.pop()
+        if str(board) in seen or ttt.terminal(board):
+            continue
+        seen.add(str(board))
+        positions.append(board)
+        boards.extend(ttt.result(board, action)
+                      for action in ttt.actions(board))
+
+    def answer_all():
+        for _ in range(args.repeat):
+            for board in positions:
+                ttt.minimax(board)
+
+    book = ttt.book = ttt.load_book()
+    _, book_time = timed(answer_all)
+    ttt.book = None
+    answer_all()
+    _, search_time = timed(answer_all)
+    ttt.book = book
+    moves = args.repeat * len(positions)
+    print(f"book loaded in {load_time * 1000:.2f} ms")
+    print(f"{len(positions)} boards: book {book_time / moves * 1e6:.1f} us "
+          f"per move, search {search_time / moves * 1e6:.1f} us per move")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="boards searched per move")
+    search.add_argument("--repeat", type=int, default=3)
+    search.set_defaults(run=benchmark_search)
+
+    throughput = commands.add_parser("throughput",
+                                     help="positions searched per second")
+    throughput.set_defaults(run=benchmark_throughput)
+
+    deepening = commands.add_parser("deepening",
+                                    help="search depth per time budget")
+    deepening.add_argument("--game", type=int, nargs=3, default=[7, 7, 5],
+                           metavar=("M", "N", "K"))
+    deepening.add_argument("--budgets", type=float, nargs="+",
+                           default=[0.1, 1, 5])
+    deepening.set_defaults(run=benchmark_deepening)
+
+    book = commands.add_parser("book", help="opening book lookups")
+    book.add_argument("--repeat", type=int, default=3)
+    book.set_defaults(run=benchmark_book)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Tic Tac Toe engine on bitboards.
+
+A position is a pair of 9-bit integers, the cells of X and the cells of
+O, where cell (i, j) is bit 3 * i + j. The functions have the same names
+and meanings as those of `tictactoe`, on positions instead of boards;
+`from_board` and `to_board` convert between the two.
+"""
+
+import math
+
+from tictactoe import (X, O, EMPTY, EXACT, LOWER, UPPER, PREFERENCE,
+                       SYMMETRIES)
+
+# Mask of all cells
+FULL = (1 << 9) - 1
+
+# Masks of the rows, columns and diagonals
+LINES = ([0b111 << 3 * i for i in range(3)]
+         + [0b1001001 << j for j in range(3)]
+         + [0b100010001, 0b001010100])
+
+# Whether each set of cells contains a line
+WINNING = [any(cells & line == line for line in LINES)
+           for cells in range(FULL + 1)]
+
+# Action of each cell bit, and bit of each action
+ACTIONS = {1 << 3 * i + j: (i, j) for i in range(3) for j in range(3)}
+BITS = {action: bit for bit, action in ACTIONS.items()}
+
+# Cell bits in the order in which they are searched
+ORDER = sorted(ACTIONS, key=lambda bit: PREFERENCE[ACTIONS[bit]])
+
+# Each set of cells moved by each rotation and reflection of the board
+SYMMETRIC = [
+    [sum(1 << k for k, cell in enumerate(symmetry) if cells >> cell & 1)
+     for cells in range(FULL + 1)]
+    for symmetry in SYMMETRIES
+]
+
+# Values of the positions searched so far, by canonical key, with their
+# kind of value
+transpositions = {}
+
+
+def initial_state():
+    """
+    Returns starting position.
+    """
+    return 0, 0
+
+
+def from_board(board):
+    """
+    Returns the position of a `tictactoe` board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, item in enumerate(row):
+            if item == X:
+                x |= 1 << 3 * i + j
+            elif item == O:
+                o |= 1 << 3 * i + j
+    return x, o
+
+
+def to_board(position):
+    """
+    Returns the `tictactoe` board of a position.
+    """
+    x, o = position
+    return [[X if x >> 3 * i + j & 1 else O if o >> 3 * i + j & 1 else EMPTY
+             for j in range(3)]
+            for i in range(3)]
+
+
+def player(position):
+    """
+    Returns player who has the next turn in a position.
+    """
+    x, o = position
+    return X if x.bit_count() == o.bit_count() else O
+
+
+def actions(position):
+    """
+    Returns set of all possible actions (i, j) available in the position.
+    """
+    x, o = position
+    empty = FULL & ~(x | o)
+    return {action for bit, action in ACTIONS.items() if empty & bit}
+
+
+def result(position, action):
+    """
+    Returns the position that results from making move (i, j).
+    """
+    x, o = position
+    bit = BITS[action]
+    if (x | o) & bit:
+        raise ValueError
+    if x.bit_count() == o.bit_count():
+        return x | bit, o
+    return x, o | bit
+
+
+def winner(position):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    x, o = position
+    if WINNING[x]:
+        return X
+    if WINNING[o]:
+        return O
+    return None
+
+
+def terminal(position):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    x, o = position
+    return WINNING[x] or WINNING[o] or x | o == FULL
+
+
+def utility(position):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    x, o = position
+    return 1 if WINNING[x] else -1 if WINNING[o] else 0
+
+
+def minimax(position):
+    """
+    Returns the optimal action for the current player in the position.
+    """
+    if terminal(position):
+        return None
+    x, o = position
+    empty = FULL & ~(x | o)
+    best = None
+    if x.bit_count() == o.bit_count():
+        value = -math.inf
+        for bit in ORDER:
+            if empty & bit:
+                new_value = search(x | bit, o, False, value, math.inf)
+                if new_value > value:
+                    value, best = new_value, bit
+                    if value == 1:
+                        break
+    else:
+        value = math.inf
+        for bit in ORDER:
+            if empty & bit:
+                new_value = search(x, o | bit, True, -math.inf, value)
+                if new_value < value:
+                    value, best = new_value, bit
+                    if value == -1:
+                        break
+    return ACTIONS[best]
+
+
+def search(x, o, maximizing, alpha=-math.inf, beta=math.inf):
+    """
+    Returns the value of a position for perfect play by alpha-beta
+    search, like `tictactoe.search`, with X to move if `maximizing`.
+    """
+    if WINNING[x]:
+        return 1
+    if WINNING[o]:
+        return -1
+    occupied = x | o
+    if occupied == FULL:
+        return 0
+
+    key = canonical(x, o)
+    entry = transpositions.get(key)
+    if entry is not None:
+        value, bound = entry
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    window = alpha, beta
+    if maximizing:
+        value = -math.inf
+        for bit in ORDER:
+            if not occupied & bit:
+                value = max(value, search(x | bit, o, False, alpha, beta))
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+    else:
+        value = math.inf
+        for bit in ORDER:
+            if not occupied & bit:
+                value = min(value, search(x, o | bit, True, alpha, beta))
+                beta = min(beta, value)
+                if alpha >= beta:
+                    break
+
+    if value <= window[0]:
+        transpositions[key] = (value, UPPER)
+    elif value >= window[1]:
+        transpositions[key] = (value, LOWER)
+    else:
+        transpositions[key] = (value, EXACT)
+    return value
+
+
+def canonical(x, o):
+    """
+    Returns an integer key of a position that is the same for all of its
+    rotations and reflections.
+    """
+    return min(table[x] << 9 | table[o] for table in SYMMETRIC)
@@ -0,0 +1,62 @@
+"""
+Writes the opening book of the 3 × 3 game used by `tictactoe.minimax`.
+
+Usage: python book.py [FILE]
+
+Every position reachable from the empty board is solved once, and the
+best move and value of each position up to symmetry are stored at its
+canonical code, so that the book is a 3 ** 9 byte table.
+"""
+
+import argparse
+
+import tictactoe as ttt
+
+
+def build():
+    """
+    Returns the table of the opening book, solving every reachable board
+    by search.
+    """
+    table = bytearray([ttt.NO_ENTRY]) * 3 ** 9
+    book, ttt.book = ttt.book, None
+    try:
+        boards = [ttt.initial_state()]
+        seen = set()
+        while boards:
+            board = boards.pop()
+            code, symmetry = ttt.canonical_code(board)
+            if code in seen or ttt.terminal(board):
+                continue
+            seen.add(code)
+
+            # The canonical board has the cell `symmetry[k]` of the board
+            # at cell k
+            cells = [item for row in board for item in row]
+            canonical = [[cells[symmetry[3 * i + j]] for j in range(3)]
+                         for i in range(3)]
+            i, j = ttt.minimax(canonical)
+            value = ttt.search(canonical)
+            table[code] = (value + 1) << 4 | 3 * i + j
+
+            boards.extend(ttt.result(board, action)
+                          for action in ttt.actions(board))
+    finally:
+        ttt.book = book
+    return bytes(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("filename", nargs="?", default=ttt.BOOK_FILE)
+    args = parser.parse_args()
+
+    table = build()
+    with open(args.filename, "wb") as f:
+        f.write(ttt.BOOK_MAGIC + table)
+    positions = sum(entry != ttt.NO_ENTRY for entry in table)
+    print(f"Wrote {positions} positions to {args.filename}")
+
+
+if __name__ == "__main__":
+    main()
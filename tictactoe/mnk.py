@@ -0,0 +1,269 @@
+"""
+Search for m,n,k-games: Tic Tac Toe on boards of any size, won by `k`
+marks in a row.
+
+The whole game tree of a larger board is far too big to search, so
+`best_move` deepens an alpha-beta search one move at a time until its
+time budget runs out, scoring the positions where the search stops with
+a heuristic. Each iteration searches first the moves found best by the
+one before, from a transposition table keyed by Zobrist hashes.
+"""
+
+import math
+import random
+import time
+from functools import lru_cache
+
+from tictactoe import X, O, EMPTY, EXACT, LOWER, UPPER, lines, terminal
+
+# Score of a win; wins in fewer moves score higher
+WIN = 1000
+
+# Nodes searched between two checks of the clock, which is also checked
+# before every heuristic evaluation, the slowest step of the search
+CHECK_INTERVAL = 256
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search when its time budget has run out, or it has
+    been cancelled.
+    """
+
+
+def best_move(board, k=3, budget=1.0, heuristic=None, max_depth=None,
+              cancelled=None):
+    """
+    Returns the best action (i, j) found for the current player on the
+    board within `budget` seconds, searching at most `max_depth` moves
+    ahead, or until the threading.Event `cancelled` is set. Returns None
+    if the game is over.
+
+    `heuristic(board, k)` scores positions where the search stops before
+    the end of the game, between -1 (O is winning) and 1 (X is winning);
+    it defaults to `evaluate`.
+    """
+    if terminal(board, k):
+        return None
+    search = Search(board, k, heuristic or evaluate,
+                    time.perf_counter() + budget, cancelled)
+    return search.run(max_depth)
+
+
+def evaluate(board, k):
+    """
+    Returns a score between -1 and 1 from the lines of `k` fields still
+    open to each player: a line holding only X's marks adds 10 to the
+    power of their number for X, and likewise for O.
+    """
+    x_score = o_score = 0
+    for line in lines(len(board), len(board[0]), k):
+        x_count = o_count = 0
+        for i, j in line:
+            item = board[i][j]
+            if item == X:
+                x_count += 1
+            elif item == O:
+                o_count += 1
+        if not o_count and x_count:
+            x_score += 10 ** x_count
+        elif not x_count and o_count:
+            o_score += 10 ** o_count
+    return (x_score - o_score) / (x_score + o_score + 1)
+
+
+class Search():
+    """
+    Iterative-deepening alpha-beta search from one board.
+
+    The search plays and takes back moves on its own copy of the board,
+    keeping its Zobrist hash up to date.
+    """
+
+    def __init__(self, board, k, heuristic, deadline, cancelled=None):
+        self.board = [list(row) for row in board]
+        self.rows, self.columns = len(board), len(board[0])
+        self.k = k
+        self.heuristic = heuristic
+        self.deadline = deadline
+        self.cancelled = cancelled
+        self.hashes = zobrist(self.rows, self.columns)
+        self.table = {}
+        self.nodes = 0
+        self.depth = 0
+
+        self.key = 0
+        self.empty = 0
+        marks = 0
+        for i, row in enumerate(self.board):
+            for j, item in enumerate(row):
+                if item == EMPTY:
+                    self.empty += 1
+                else:
+                    marks += 1 if item == X else -1
+                    self.key ^= self.hashes[item][i][j]
+        self.turn = X if marks == 0 else O
+
+    def run(self, max_depth=None):
+        """
+        Returns the best action of the deepest search completed before
+        the deadline, or the first action in search order if none was.
+        """
+        best = self.ordered(None)[0]
+        limit = self.empty if max_depth is None else min(max_depth,
+                                                         self.empty)
+        for depth in range(1, limit + 1):
+            try:
+                value, move = self.root(depth)
+            except Timeout:
+                break
+            best = move
+            self.depth = depth
+            # A won or lost game will not change with a deeper search
+            if abs(value) > WIN // 2:
+                break
+        return best
+
+    def root(self, depth):
+        """
+        Returns the value and best action of a search `depth` moves deep.
+        """
+        alpha, beta = -math.inf, math.inf
+        best_value, best = -math.inf, None
+        entry = self.table.get(self.key)
+        for move in self.ordered(entry[3] if entry else None):
+            self.play(move)
+            value = -self.negamax(depth - 1, -beta, -alpha, 1, move)
+            self.undo(move)
+            if value > best_value:
+                best_value, best = value, move
+            alpha = max(alpha, value)
+        self.table[self.key] = (depth, best_value, EXACT, best)
+        return best_value, best
+
+    def negamax(self, depth, alpha, beta, ply, last):
+        """
+        Returns the value of the board for the player to move, `ply`
+        moves below the root, after `last` was played.
+        """
+        self.nodes += 1
+        if ((depth == 0 or self.nodes % CHECK_INTERVAL == 0)
+                and (time.perf_counter() > self.deadline
+                     or self.cancelled is not None
+                     and self.cancelled.is_set())):
+            raise Timeout
+
+        if self.wins(last):
+            return -(WIN - ply)
+        if not self.empty:
+            return 0
+        if depth == 0:
+            score = self.heuristic(self.board, self.k)
+            return score if self.turn == X else -score
+
+        entry = self.table.get(self.key)
+        hint = None
+        if entry is not None:
+            entry_depth, value, bound, hint = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        window = alpha, beta
+        best_value, best = -math.inf, None
+        for move in self.ordered(hint):
+            self.play(move)
+            value = -self.negamax(depth - 1, -beta, -alpha, ply + 1, move)
+            self.undo(move)
+            if value > best_value:
+                best_value, best = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= window[0]:
+            bound = UPPER
+        elif best_value >= window[1]:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[self.key] = (depth, best_value, bound, best)
+        return best_value
+
+    def ordered(self, hint):
+        """
+        Returns the empty fields in search order: `hint` first, then the
+        fields with the most marks around them, nearest the center first.
+        """
+        board = self.board
+        rows, columns = self.rows, self.columns
+        scored = []
+        for i in range(rows):
+            for j in range(columns):
+                if board[i][j] != EMPTY or (i, j) == hint:
+                    continue
+                around = 0
+                for di in (-1, 0, 1):
+                    for dj in (-1, 0, 1):
+                        if (0 <= i + di < rows and 0 <= j + dj < columns
+                                and board[i + di][j + dj] != EMPTY):
+                            around += 1
+                distance = abs(2 * i - rows + 1) + abs(2 * j - columns + 1)
+                scored.append((-around, distance, (i, j)))
+        scored.sort()
+        moves = [move for _, _, move in scored]
+        if hint is not None:
+            moves.insert(0, hint)
+        return moves
+
+    def play(self, move):
+        i, j = move
+        self.board[i][j] = self.turn
+        self.key ^= self.hashes[self.turn][i][j]
+        self.turn = O if self.turn == X else X
+        self.empty -= 1
+
+    def undo(self, move):
+        i, j = move
+        self.turn = O if self.turn == X else X
+        self.key ^= self.hashes[self.turn][i][j]
+        self.board[i][j] = EMPTY
+        self.empty += 1
+
+    def wins(self, move):
+        """
+        Returns whether the mark played at `move` completes a line.
+        """
+        i, j = move
+        board = self.board
+        item = board[i][j]
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                row, field = i + sign * di, j + sign * dj
+                while (0 <= row < self.rows and 0 <= field < self.columns
+                       and board[row][field] == item):
+                    count += 1
+                    row, field = row + sign * di, field + sign * dj
+            if count >= self.k:
+                return True
+        return False
+
+
+@lru_cache(maxsize=None)
+def zobrist(rows, columns):
+    """
+    Returns random 64-bit numbers for each player and field of a board
+    with the given dimensions, whose XOR over the marks on a board
+    hashes it.
+    """
+    rng = random.Random(rows * 1000 + columns)
+    return {player: [[rng.getrandbits(64) for _ in range(columns)]
+                     for _ in range(rows)]
+            for player in (X, O)}
@@ -3,9 +3,11 @@ import sys
 import time
 
 import tictactoe as ttt
+import worker
 
 pygame.init()
 size = width, height = 600, 400
+fps = 60
 
 # Colors
 black = (0, 0, 0)
@@ -20,12 +22,18 @@ moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 user = None
 board = ttt.initial_state()
 ai_turn = False
+ai = worker.MoveWorker(ttt.minimax)
+clock = pygame.time.Clock()
 
 while True:
 
+    reset = False
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
+        # Escape starts over at any time, even while the computer thinks
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            reset = True
 
     screen.fill(black)
 
@@ -102,20 +110,23 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            # Dots that keep moving while the move is searched
+            dots = int(ai.elapsed() * 4) % 4
+            title = f"Computer thinking{'.' * dots}{' ' * (3 - dots)}"
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, searched in the background
         if user != player and not game_over:
             if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
+                move = ai.poll()
+                if move is not None:
+                    board = ttt.result(board, move)
+                    ai_turn = False
             else:
+                ai.start(board)
                 ai_turn = True
 
         # Check for a user move
@@ -127,20 +138,27 @@ while True:
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+        # Play Again once the game is over, or Reset during it
+        againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+        again = mediumFont.render("Play Again" if game_over else "Reset",
+                                  True, black)
+        againRect = again.get_rect()
+        againRect.center = againButton.center
+        pygame.draw.rect(screen, white, againButton)
+        screen.blit(again, againRect)
+        click, _, _ = pygame.mouse.get_pressed()
+        if click == 1:
+            mouse = pygame.mouse.get_pos()
+            if againButton.collidepoint(mouse):
+                time.sleep(0.2)
+                reset = True
+
+    # Stop any search in progress and go back to choosing a player
+    if reset:
+        user = None
+        board = ttt.initial_state()
+        ai.cancel()
+        ai_turn = False
 
     pygame.display.flip()
+    clock.tick(fps)
@@ -1,22 +1,29 @@
 """
 Tic Tac Toe Player
+
+Boards may have any number of rows and columns, and `winner`, `terminal`
+and `utility` take the number in a row `k` that wins (3 by default).
+`minimax` searches the standard 3 × 3 game to the end, or answers from
+the opening book written by book.py when there is one; `mnk.best_move`
+searches larger games within a time budget.
 """
 
 import math
+import os
+import warnings
 from copy import deepcopy
+from functools import lru_cache
 
 X = "X"
 O = "O"
 EMPTY = None
 
 
-def initial_state():
+def initial_state(rows=3, columns=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * columns for _ in range(rows)]
 
 
 def player(board):
@@ -68,58 +75,60 @@ def result(board, action):
     return c_board
 
 
-def winner(board):
+def winner(board, k=3):
     """
-    Returns the winner of the game, if there is one.
+    Returns the winner of the game, if there is one: the player with `k`
+    marks in a row, column or diagonal.
     """
     # raise NotImplementedError
-    diagonal_1, diagonal_2 = set(), set()
-    l_board = len(board)
-    vertical_list = list(zip(*board))
-    for row_idx in range(l_board):
-        # Check if any from the players have combination in the rows
-        # If the set contain only 1 value than that value is winner
-        if len(set(board[row_idx])) == 1 and board[row_idx][0] != EMPTY:
-            return board[row_idx][0]
-
-        # Check if any from the players have combination in the columns
-        # If the set contain only 1 value than that value is winner
-        if len(set(vertical_list[row_idx])) == 1 and vertical_list[row_idx][0] != EMPTY:
-            return vertical_list[row_idx][0]
-
-        # Creating set with values in the diagonals
-        # Create diagonal [0][0],[1][1],[2][2]
-        diagonal_1.add(board[row_idx][row_idx])
-        # Create diagonal [0][2],[1][1],[2][0]
-        diagonal_2.add(board[row_idx][l_board-1])
-        l_board -= 1
-
-    # Check if any from the players have combination in the diagonals
-    if len(diagonal_1) == 1:
-        winning_player = diagonal_1.pop()
-        return winning_player if winning_player != EMPTY else None
-    elif len(diagonal_2) == 1:
-        winning_player = diagonal_2.pop()
-        return winning_player if winning_player != EMPTY else None
-
-
-def terminal(board):
+    for line in lines(len(board), len(board[0]), k):
+        row_idx, field_idx = line[0]
+        item = board[row_idx][field_idx]
+        if item == EMPTY:
+            continue
+        for row_idx, field_idx in line[1:]:
+            if board[row_idx][field_idx] != item:
+                break
+        else:
+            return item
+    return None
+
+
+@lru_cache(maxsize=None)
+def lines(rows, columns, k):
+    """
+    Returns every line of `k` fields (i, j) in a row, column or diagonal
+    of a board with the given dimensions.
+    """
+    found = []
+    for row_idx in range(rows):
+        for field_idx in range(columns):
+            for row_step, field_step in DIRECTIONS:
+                line = tuple((row_idx + t * row_step, field_idx + t * field_step)
+                             for t in range(k))
+                end_row, end_field = line[-1]
+                if 0 <= end_row < rows and 0 <= end_field < columns:
+                    found.append(line)
+    return tuple(found)
+
+
+def terminal(board, k=3):
     """
     Returns True if game is over, False otherwise.
     """
     # raise NotImplementedError
-    if winner(board) or not actions(board):
+    if winner(board, k) or not actions(board):
         return True
     else:
         return False
 
 
-def utility(board):
+def utility(board, k=3):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
     # raise NotImplementedError
-    res = winner(board)
+    res = winner(board, k)
     if res == X:
         return 1
     elif res == O:
@@ -128,45 +137,213 @@ def utility(board):
         return 0
 
 
-def minimax(board):
+def minimax(board, cancelled=None):
     """
-    Returns the optimal action for the current player on the board.
+    Returns the optimal action for the current player on the 3 × 3 board.
+    Returns None instead if the threading.Event `cancelled` is set before
+    every move has been searched.
+
+    Raises ValueError for boards of other sizes, which are too large to
+    search to the end; use `mnk.best_move` for those.
     """
     # raise NotImplementedError
-    result_action = tuple()
-    p = player(board)
+    if len(board) != 3 or any(len(row) != 3 for row in board):
+        raise ValueError("minimax only solves 3 × 3 boards; "
+                         "use mnk.best_move for larger ones")
+    if terminal(board):
+        return None
+    if book is not None:
+        action = book_move(board)
+        if action is not None:
+            return action
+
+    # Each move only has to be searched far enough to show whether it is
+    # better than the best one so far
+    result_action = None
     if player(board) == X:
-        value = -1
-        for act in actions(board):
-            new_value = min_value(result(board, act))
+        value = -math.inf
+        for act in ordered_actions(board):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            new_value = search(result(board, act), value, math.inf)
             if new_value > value:
                 value = new_value
                 result_action = act
-    elif player(board) == O:
-        value = 1
-        for act in actions(board):
-            new_value = max_value(result(board, act))
+                if value == 1:
+                    break
+    else:
+        value = math.inf
+        for act in ordered_actions(board):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            new_value = search(result(board, act), -math.inf, value)
             if new_value < value:
                 value = new_value
                 result_action = act
+                if value == -1:
+                    break
     return result_action
 
 
-def min_value(board):
+def search(board, alpha=-math.inf, beta=math.inf):
+    """
+    Returns the value of the board for perfect play, searched with
+    alpha-beta pruning: if the value is at most `alpha` or at least
+    `beta`, only a bound on that side is returned.
+
+    Values are remembered in `transpositions` for every board symmetric
+    to this one, with whether they are exact or only bounds.
+    """
     if terminal(board):
         return utility(board)
 
-    value = 1
-    for act in actions(board):
-        value = min(value, max_value(result(board, act)))
+    key = canonical(board)
+    entry = transpositions.get(key)
+    if entry is not None:
+        value, bound = entry
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    window = alpha, beta
+    maximizing = player(board) == X
+    value = -math.inf if maximizing else math.inf
+    for act in ordered_actions(board):
+        new_value = search(result(board, act), alpha, beta)
+        if maximizing:
+            value = max(value, new_value)
+            alpha = max(alpha, value)
+        else:
+            value = min(value, new_value)
+            beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    if value <= window[0]:
+        transpositions[key] = (value, UPPER)
+    elif value >= window[1]:
+        transpositions[key] = (value, LOWER)
+    else:
+        transpositions[key] = (value, EXACT)
     return value
 
 
-def max_value(board):
-    if terminal(board):
-        return utility(board)
+def ordered_actions(board):
+    """
+    Returns the possible actions on the board, the center first, then
+    the corners, then the edges, so that good moves are searched first.
+    """
+    return sorted(actions(board), key=lambda action: PREFERENCE[action])
 
-    value = -1
-    for act in actions(board):
-        value = max(value, min_value(result(board, act)))
-    return value
+
+def canonical(board):
+    """
+    Returns a string encoding of the board that is the same for all of
+    its rotations and reflections.
+    """
+    cells = "".join(CELL[item] for row in board for item in row)
+    return min("".join(cells[i] for i in symmetry) for symmetry in SYMMETRIES)
+
+
+def load_book(filename=None):
+    """
+    Returns the table of an opening book file written by book.py, or
+    None if there is no such file. A file that is not a whole opening
+    book is ignored with a warning, so that `minimax` searches instead.
+    """
+    filename = filename or BOOK_FILE
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if (data[:len(BOOK_MAGIC)] != BOOK_MAGIC
+            or len(data) != len(BOOK_MAGIC) + 3 ** 9):
+        warnings.warn(f"{filename} is not an opening book; ignoring it")
+        return None
+    return data[len(BOOK_MAGIC):]
+
+
+def book_move(board):
+    """
+    Returns the optimal action on the board from the opening book, or
+    None if the book has no entry for it.
+    """
+    code, symmetry = canonical_code(board)
+    entry = book[code]
+    if entry == NO_ENTRY:
+        return None
+    return divmod(symmetry[entry & 0xF], 3)
+
+
+def canonical_code(board):
+    """
+    Returns the smallest base-3 code of the board's rotations and
+    reflections, where empty, X and O cells are the digits 0, 1 and 2,
+    with the symmetry that gives it.
+    """
+    cells = [DIGIT[item] for row in board for item in row]
+    return min(
+        (sum(cells[cell] * 3 ** k for k, cell in enumerate(symmetry)),
+         symmetry)
+        for symmetry in SYMMETRIES
+    )
+
+
+def _symmetries():
+    """
+    Returns, for each of the 8 rotations and reflections of the board,
+    the cells (as indexes 3 * i + j) moved to each cell in turn.
+    """
+    symmetries = []
+    cells = [(i, j) for i in range(3) for j in range(3)]
+    for reflect in (False, True):
+        for turns in range(4):
+            symmetry = []
+            for i, j in cells:
+                if reflect:
+                    j = 2 - j
+                for _ in range(turns):
+                    i, j = j, 2 - i
+                symmetry.append(3 * i + j)
+            symmetries.append(symmetry)
+    return symmetries
+
+
+# Directions of rows, columns and the two diagonals, as (row, field) steps
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Characters of the cells in board encodings
+CELL = {X: "X", O: "O", EMPTY: "-"}
+
+SYMMETRIES = _symmetries()
+
+# Order in which actions are searched: center, corners, edges
+PREFERENCE = {(i, j): (i % 2 == 1) + (j % 2 == 1)
+              for i in range(3) for j in range(3)}
+PREFERENCE[(1, 1)] = -1
+
+# Kinds of values in the transposition table
+EXACT, LOWER, UPPER = "exact", "lower", "upper"
+
+# Values of the boards searched so far, by canonical encoding, with their
+# kind of value
+transpositions = {}
+
+# Digits of the cells in canonical codes
+DIGIT = {EMPTY: 0, X: 1, O: 2}
+
+# Opening book of the 3 × 3 game written by book.py: one byte for each
+# canonical code, with the value of the board plus one in the high four
+# bits and the best cell 3 * i + j of its canonical board in the low four
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "tictactoe.book")
+BOOK_MAGIC = b"TTTBOOK1"
+NO_ENTRY = 0xFF
+
+book = load_book()
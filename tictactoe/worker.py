@@ -0,0 +1,95 @@
+"""
+Background computation of AI moves, so that runner.py keeps drawing
+frames and handling input while the computer thinks.
+"""
+
+import threading
+import time
+from copy import deepcopy
+
+# Seconds the computer is shown thinking before its move is played,
+# however fast the move was found
+MIN_THINKING = 0.5
+
+
+class MoveWorker():
+    """
+    Runs a search function, such as `tictactoe.minimax`, on a background
+    thread for one board at a time.
+
+    The search is called as `search(board, cancelled=event)`, with a
+    threading.Event that is set when the search is cancelled or a new
+    one starts, and should then return early; its result is ignored.
+    """
+
+    def __init__(self, search, min_thinking=MIN_THINKING):
+        self.search = search
+        self.min_thinking = min_thinking
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.cancelled = threading.Event()
+        self.started = None
+        self.done = False
+        self.move = None
+        self.error = None
+
+    def start(self, board):
+        """
+        Starts searching for a move on a copy of the board, abandoning
+        any search in progress.
+        """
+        with self.lock:
+            self.generation += 1
+            self.cancelled.set()
+            self.cancelled = cancelled = threading.Event()
+            self.started = time.perf_counter()
+            self.done = False
+            self.move = self.error = None
+            generation = self.generation
+        thread = threading.Thread(target=self._run,
+                                  args=(generation, deepcopy(board),
+                                        cancelled),
+                                  daemon=True)
+        thread.start()
+
+    def _run(self, generation, board, cancelled):
+        try:
+            move, error = self.search(board, cancelled=cancelled), None
+        except Exception as e:
+            move, error = None, e
+        with self.lock:
+            if generation == self.generation:
+                self.move, self.error, self.done = move, error, True
+
+    def poll(self):
+        """
+        Returns the move found by the current search once it is done and
+        has been shown thinking for `min_thinking` seconds, and None
+        until then. Raises the exception of a search that failed.
+        """
+        with self.lock:
+            if (not self.done
+                    or time.perf_counter() - self.started < self.min_thinking):
+                return None
+            self.done = False
+            self.started = None
+            if self.error is not None:
+                raise self.error
+            return self.move
+
+    def cancel(self):
+        """
+        Stops the current search, if any.
+        """
+        with self.lock:
+            self.generation += 1
+            self.cancelled.set()
+            self.started = None
+            self.done = False
+
+    def elapsed(self):
+        """
+        Returns the seconds since the current search started, or 0.
+        """
+        started = self.started
+        return time.perf_counter() - started if started is not None else 0